@@ -0,0 +1,132 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+PROFILES = ('dev', 'prod')
+WARMED_PROFILES = ('prod',)
+STARTUP_CODE = (
+    'from yatube.wsgi import application; '
+    'from django.urls import get_resolver; '
+    'get_resolver().url_patterns'
+)
+
+
+def parse_importtime(output):
+    """
+    Разобрать вывод python -X importtime.
+
+    Возвращает словарь {модуль: собственное время импорта в мкс}.
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(self_time)
+    return modules
+
+
+def measure_startup(profile):
+    """
+    Запустить интерпретатор с профилем настроек profile, загрузить
+    WSGI-приложение и URLconf.
+
+    Профилю prod нужен SECRET_KEY: если он не задан в окружении, для
+    замера берётся ключ текущих настроек.
+
+    Возвращает время запуска процесса в секундах и время импорта
+    каждого модуля в мкс.
+    """
+    env = {
+        'SECRET_KEY': settings.SECRET_KEY,
+        **os.environ,
+        'YATUBE_ENV': profile,
+        'DJANGO_SETTINGS_MODULE': 'yatube.settings',
+    }
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=settings.BASE_DIR,
+        env=env,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return time.perf_counter() - start, parse_importtime(result.stderr)
+
+
+def group_by_package(modules):
+    """Получить суммарное время импорта по пакетам верхнего уровня."""
+    packages = defaultdict(int)
+    for name, self_time in modules.items():
+        packages[name.split('.', 1)[0]] += self_time
+    return packages
+
+
+class Command(BaseCommand):
+    """
+    Команда сравнения времени запуска профилей настроек.
+
+    Для каждого профиля несколько раз запускает интерпретатор с
+    python -X importtime, загружает WSGI-приложение и URLconf и выводит
+    медианы времени запуска и импорта, а также самые медленные пакеты.
+    Вне DEBUG yatube.wsgi прогревает шаблоны, поэтому время запуска
+    профиля prod включает прогрев, а dev - нет.
+    """
+
+    help = 'Сравнить время запуска воркера с профилями настроек dev и prod'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Количество запусков каждого профиля',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Количество самых медленных пакетов в выводе',
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in PROFILES:
+            wall_times, import_times = [], []
+            for _ in range(options['runs']):
+                wall_time, modules = measure_startup(profile)
+                wall_times.append(wall_time)
+                import_times.append(sum(modules.values()) / 10 ** 6)
+            results[profile] = (
+                statistics.median(wall_times),
+                statistics.median(import_times),
+            )
+            packages = sorted(
+                group_by_package(modules).items(),
+                key=lambda package: package[1],
+                reverse=True,
+            )
+            warmup = ''
+            if profile in WARMED_PROFILES:
+                warmup = ' с прогревом шаблонов'
+            self.stdout.write(
+                f'{profile}: запуск{warmup} '
+                f'{results[profile][0] * 1000:.0f} мс, '
+                f'импорт {results[profile][1] * 1000:.0f} мс, '
+                f'модулей {len(modules)}'
+            )
+            for name, self_time in packages[:options['top']]:
+                self.stdout.write(f'  {name:<24}{self_time / 1000:>8.1f} мс')
+        dev, prod = results['dev'], results['prod']
+        self.stdout.write(self.style.SUCCESS(
+            f'Разница dev - prod: запуск {(dev[0] - prod[0]) * 1000:.0f} мс '
+            f'(prod с прогревом шаблонов), '
+            f'импорт {(dev[1] - prod[1]) * 1000:.0f} мс'
+        ))
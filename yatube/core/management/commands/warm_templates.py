@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    """
+    Команда прогрева шаблонов.
+
+    Разбирает все шаблоны проекта и выводит время разбора. Завершается
+    с ошибкой, если какой-либо шаблон не разбирается, поэтому подходит
+    для проверки перед деплоем.
+    """
+
+    help = 'Разобрать и закэшировать все шаблоны проекта'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        warmed, errors = warm_templates()
+        elapsed = time.perf_counter() - started
+        for name, error in errors.items():
+            self.stderr.write(f'{name}: {error}')
+        if errors:
+            raise CommandError(f'Шаблонов с ошибками: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето шаблонов: {len(warmed)}, {elapsed * 1000:.1f} мс'
+        ))
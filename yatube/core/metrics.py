@@ -0,0 +1,277 @@
+"""
+Метрики приложения в формате Prometheus.
+
+Каждый процесс копит значения в памяти, в реестре registry. Процессы
+сервера, в которых реестр включён методом enable, не чаще раза в
+METRICS_FLUSH_INTERVAL секунд записывают их в свой файл в каталоге
+METRICS_DIR; команды manage.py и тесты файлов не пишут. Эндпоинт
+/metrics суммирует файлы всех процессов, поэтому показывает метрики всех
+воркеров сервера. Гистограммы хранятся счётчиками своих корзин, так что
+любая метрика суммируется простым сложением. Значения завершившихся
+процессов при запуске воркера и при сборе метрик переносятся в общий
+файл AGGREGATE_FILENAME, а их файлы удаляются, поэтому счётчики не
+уменьшаются при перезапуске воркеров.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+AGGREGATE_FILENAME = 'aggregate.json'
+LOCK_FILENAME = 'aggregate.lock'
+
+logger = logging.getLogger(__name__)
+
+# Метрика: (тип, описание).
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа по имени URL.',
+    ),
+    'yatube_db_queries_total': (
+        'counter', 'Количество SQL-запросов по имени URL.',
+    ),
+    'yatube_db_query_duration_seconds_total': (
+        'counter', 'Суммарное время SQL-запросов по имени URL.',
+    ),
+    'yatube_cache_lookups_total': (
+        'counter', 'Обращения к кэшу по имени URL и результату.',
+    ),
+    'yatube_feed_cache_lookups_total': (
+        'counter', 'Обращения к кэшу фрагментов лент по ленте и результату.',
+    ),
+    'yatube_thumbnail_generation_seconds': (
+        'histogram', 'Время создания миниатюры по размеру.',
+    ),
+}
+
+
+def escape_label(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def is_running(pid):
+    """Проверить, что процесс с номером pid ещё работает."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_values(path):
+    """Прочитать значения из файла метрик или None, если это не удалось."""
+    try:
+        with open(path) as metrics_file:
+            return json.load(metrics_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_values(path, values):
+    """Записать значения в файл метрик атомарно, через временный файл."""
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w') as metrics_file:
+        json.dump(values, metrics_file)
+    os.replace(temporary_path, path)
+
+
+def series(name, labels):
+    """
+    Получить имя временного ряда с метками в формате Prometheus.
+    Метка le корзины гистограммы всегда идёт последней.
+    """
+    if not labels:
+        return name
+    pairs = ','.join(
+        f'{key}="{escape_label(labels[key])}"'
+        for key in sorted(labels, key=lambda key: (key == 'le', key))
+    )
+    return f'{name}{{{pairs}}}'
+
+
+class MetricsRegistry:
+    """
+    Класс реестра метрик процесса.
+
+    Хранит значения временных рядов по их именам с метками. Методы
+    потокобезопасны: метрики пишут и запросы, и фоновые потоки. В файл
+    значения записываются, только если реестр включён.
+    """
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+        self.flushed = time.monotonic()
+        self.enabled = False
+
+    def enable(self):
+        """
+        Включить запись метрик в файл процесса. Вызывается при запуске
+        процесса сервера: удаляет файлы завершившихся процессов и
+        записывает метрики при выходе.
+        """
+        self.enabled = True
+        self.prune()
+        atexit.register(self.flush, force=True)
+
+    def inc(self, name, value=1, **labels):
+        """Увеличить счётчик."""
+        with self.lock:
+            self.values[series(name, labels)] += value
+        self.flush()
+
+    def observe(self, name, value, **labels):
+        """Добавить наблюдение в гистограмму."""
+        with self.lock:
+            for bucket in BUCKETS:
+                if value <= bucket:
+                    self.values[series(
+                        f'{name}_bucket', {**labels, 'le': bucket},
+                    )] += 1
+            self.values[series(
+                f'{name}_bucket', {**labels, 'le': '+Inf'},
+            )] += 1
+            self.values[series(f'{name}_sum', labels)] += value
+            self.values[series(f'{name}_count', labels)] += 1
+        self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    def get_path(self):
+        return os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+
+    def flush(self, force=False):
+        """
+        Записать значения в файл процесса, если с прошлой записи прошло
+        METRICS_FLUSH_INTERVAL секунд или задан force. В выключенном
+        реестре и без значений ничего не записывается.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            now = time.monotonic()
+            interval = settings.METRICS_FLUSH_INTERVAL
+            if not self.values or (
+                not force and now - self.flushed < interval
+            ):
+                return
+            self.flushed = now
+            path = self.get_path()
+            try:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                write_values(path, self.values)
+            except OSError:
+                logger.exception('Не удалось записать метрики в %s', path)
+
+    def prune(self):
+        """
+        Перенести значения процессов, которые уже завершились, в общий
+        файл и удалить их файлы. Перенос выполняется под блокировкой
+        файла, чтобы процессы не перенесли одни и те же значения дважды.
+        """
+        if not os.path.isdir(settings.METRICS_DIR):
+            return
+        lock_path = os.path.join(settings.METRICS_DIR, LOCK_FILENAME)
+        aggregate_path = os.path.join(settings.METRICS_DIR, AGGREGATE_FILENAME)
+        try:
+            with open(lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                finished = [
+                    filename for filename in os.listdir(settings.METRICS_DIR)
+                    if filename.split('.', 1)[0].isdigit()
+                    and not is_running(int(filename.split('.', 1)[0]))
+                ]
+                if not finished:
+                    return
+                totals = defaultdict(float, read_values(aggregate_path) or {})
+                for filename in finished:
+                    if filename.endswith('.json'):
+                        path = os.path.join(settings.METRICS_DIR, filename)
+                        for key, value in (read_values(path) or {}).items():
+                            totals[key] += value
+                write_values(aggregate_path, totals)
+                for filename in finished:
+                    os.remove(os.path.join(settings.METRICS_DIR, filename))
+        except OSError:
+            logger.exception(
+                'Не удалось перенести метрики в %s', aggregate_path,
+            )
+
+    def collect(self):
+        """
+        Получить сумму значений всех процессов. Значения текущего
+        процесса берутся из памяти, а не из его файла.
+        """
+        own_path = self.get_path()
+        totals = defaultdict(float, self.snapshot())
+        self.prune()
+        if not os.path.isdir(settings.METRICS_DIR):
+            return totals
+        for filename in os.listdir(settings.METRICS_DIR):
+            path = os.path.join(settings.METRICS_DIR, filename)
+            if not filename.endswith('.json') or path == own_path:
+                continue
+            values = read_values(path)
+            if values is None:
+                continue
+            for key, value in values.items():
+                totals[key] += value
+        return totals
+
+
+def get_family(key):
+    """Получить имя метрики, к которой относится временной ряд."""
+    name = key.split('{', 1)[0]
+    if name in METRICS:
+        return name
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return None
+
+
+def sort_key(key):
+    """
+    Получить ключ сортировки временных рядов, при котором корзины
+    гистограммы идут по возрастанию границы.
+    """
+    if 'le="' not in key:
+        return key, 0
+    start, le = key.split('le="', 1)
+    return start, float(le.split('"', 1)[0])
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render_metrics(values):
+    """Получить метрики в текстовом формате Prometheus."""
+    families = defaultdict(list)
+    for key in sorted(values, key=sort_key):
+        value = format_value(values[key])
+        families[get_family(key)].append(f'{key} {value}')
+    lines = []
+    for name, (metric_type, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(families[name])
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,76 @@
+import json
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .metrics import registry
+from .profiling import RequestProfile, milliseconds
+
+slow_requests_logger = logging.getLogger('yatube.slow_requests')
+
+
+class ProfilingMiddleware:
+    """
+    Middleware профилирования запросов.
+
+    Добавляет к каждому ответу заголовок Server-Timing с именем
+    view-функции, количеством и временем SQL-запросов, временем
+    рендеринга шаблонов и попаданиями в кэш. Запросы дольше
+    SLOW_REQUEST_THRESHOLD_MS записываются строкой JSON в журнал
+    yatube.slow_requests вместе с самыми медленными SQL-запросами.
+    Те же значения записываются в метрики по имени URL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        with profile.activate():
+            response = self.get_response(request)
+
+        resolver_match = request.resolver_match
+        view_name = resolver_match.view_name if resolver_match else None
+        response['Server-Timing'] = profile.server_timing(view_name)
+        self.record_metrics(view_name or 'unresolved', profile)
+        if milliseconds(profile.duration) >= (
+            settings.SLOW_REQUEST_THRESHOLD_MS
+        ):
+            self.log_slow_request(request, response, view_name, profile)
+
+        return response
+
+    def record_metrics(self, view, profile):
+        registry.observe(
+            'yatube_request_duration_seconds', profile.duration, view=view,
+        )
+        registry.inc('yatube_db_queries_total', profile.sql_count, view=view)
+        registry.inc(
+            'yatube_db_query_duration_seconds_total', profile.sql_time,
+            view=view,
+        )
+        registry.inc(
+            'yatube_cache_lookups_total', profile.cache_hits,
+            view=view, result='hit',
+        )
+        registry.inc(
+            'yatube_cache_lookups_total', profile.cache_misses,
+            view=view, result='miss',
+        )
+
+    def log_slow_request(self, request, response, view_name, profile):
+        slow_requests_logger.warning(json.dumps({
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'view': view_name,
+            'ms': milliseconds(profile.duration),
+            'sql_count': profile.sql_count,
+            'sql_ms': milliseconds(profile.sql_time),
+            'template_ms': milliseconds(profile.template_time),
+            'cache_hits': profile.cache_hits,
+            'cache_misses': profile.cache_misses,
+            'slowest_sql': profile.get_slowest_queries(),
+        }, ensure_ascii=False))
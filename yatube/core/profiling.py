@@ -0,0 +1,192 @@
+"""
+Профилирование запросов.
+
+RequestProfile собирает за время обработки запроса количество и время
+SQL-запросов, время рендеринга шаблонов и попадания и промахи кэша.
+Профиль текущего запроса хранится в локальной памяти потока: SQL
+считается через execute_wrapper соединений, кэш - через обёртки get и
+get_many экземпляров кэша потока, шаблоны - бэкендом
+ProfilingDjangoTemplates.
+"""
+import heapq
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise,
+)
+from django.template.exceptions import TemplateDoesNotExist
+
+SLOWEST_QUERIES = 5
+
+_local = threading.local()
+
+
+def get_profile():
+    """Получить профиль текущего запроса или None вне профилирования."""
+    return getattr(_local, 'profile', None)
+
+
+def milliseconds(seconds):
+    """Перевести секунды в миллисекунды с точностью до сотых."""
+    return round(seconds * 1000, 2)
+
+
+class RequestProfile:
+    """
+    Класс профиля одного запроса.
+
+    Хранит счётчики запроса и SLOWEST_QUERIES самых медленных
+    SQL-запросов без параметров, чтобы в журнал не попадали данные
+    пользователей.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.duration = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.slowest_queries = []
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add_query(sql, time.perf_counter() - start)
+
+    def add_query(self, sql, duration):
+        self.sql_count += 1
+        self.sql_time += duration
+        query = (duration, self.sql_count, sql)
+        if len(self.slowest_queries) < SLOWEST_QUERIES:
+            heapq.heappush(self.slowest_queries, query)
+        else:
+            heapq.heappushpop(self.slowest_queries, query)
+
+    @contextmanager
+    def measure_template(self):
+        """
+        Замерить рендеринг шаблона. Вложенные рендеринги входят во
+        время внешнего и отдельно не учитываются.
+        """
+        start = time.perf_counter()
+        self.template_depth += 1
+        try:
+            yield
+        finally:
+            self.template_depth -= 1
+            if not self.template_depth:
+                self.template_time += time.perf_counter() - start
+
+    def count_cache_get(self, get):
+        missing = object()
+
+        def wrapper(key, default=None, version=None):
+            value = get(key, missing, version=version)
+            if value is missing:
+                self.cache_misses += 1
+                return default
+            self.cache_hits += 1
+            return value
+        return wrapper
+
+    def count_cache_get_many(self, get_many):
+        def wrapper(keys, version=None):
+            keys = list(keys)
+            values = get_many(keys, version=version)
+            self.cache_hits += len(values)
+            self.cache_misses += len(keys) - len(values)
+            return values
+        return wrapper
+
+    @contextmanager
+    def count_cache_lookups(self):
+        """
+        Считать обращения к кэшам. Экземпляры кэшей у каждого потока свои,
+        поэтому обёртки не затрагивают запросы других потоков.
+        """
+        backends = [caches[alias] for alias in settings.CACHES]
+        for backend in backends:
+            backend.get = self.count_cache_get(backend.get)
+            backend.get_many = self.count_cache_get_many(backend.get_many)
+        try:
+            yield
+        finally:
+            for backend in backends:
+                del backend.get
+                del backend.get_many
+
+    @contextmanager
+    def activate(self):
+        """Профилировать запрос, обрабатываемый внутри блока with."""
+        _local.profile = self
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.sql_wrapper),
+                    )
+                stack.enter_context(self.count_cache_lookups())
+                yield
+        finally:
+            _local.profile = None
+            self.duration = time.perf_counter() - self.start
+
+    def get_slowest_queries(self):
+        return [
+            {'sql': sql, 'ms': milliseconds(duration)}
+            for duration, _, sql in sorted(self.slowest_queries, reverse=True)
+        ]
+
+    def server_timing(self, view_name):
+        """Получить значение заголовка Server-Timing."""
+        metrics = [
+            f'sql;dur={milliseconds(self.sql_time)};'
+            f'desc="{self.sql_count} queries"',
+            f'tpl;dur={milliseconds(self.template_time)}',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} misses"',
+            f'total;dur={milliseconds(self.duration)}',
+        ]
+        if view_name:
+            metrics.insert(0, f'view;desc="{view_name}"')
+        return ', '.join(metrics)
+
+
+class ProfilingTemplate(Template):
+    """Класс шаблона, время рендеринга которого входит в профиль."""
+
+    def render(self, context=None, request=None):
+        profile = get_profile()
+        if profile is None:
+            return super().render(context, request)
+        with profile.measure_template():
+            return super().render(context, request)
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """
+    Класс бэкенда шаблонов Django, замеряющий время их рендеринга.
+
+    Поведение шаблонов не меняется; вне профилируемого запроса замер
+    не выполняется.
+    """
+
+    def from_string(self, template_code):
+        return ProfilingTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfilingTemplate(
+                self.engine.get_template(template_name), self,
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
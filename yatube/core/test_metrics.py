@@ -0,0 +1,188 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import (
+    AGGREGATE_FILENAME, LOCK_FILENAME, MetricsRegistry, registry,
+    render_metrics,
+)
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    """Класс для тестирования метрик и эндпоинта /metrics."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создать автора и пост."""
+        cls.user = User.objects.create(username='TestAuthor')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        """Подставить пустой каталог метрик и очистить кэш."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.metrics_dir = directory.name
+        settings = override_settings(METRICS_DIR=self.metrics_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+
+    def get_metrics(self):
+        """Получить значения временных рядов с эндпоинта /metrics."""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        values = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                key, value = line.rsplit(' ', 1)
+                values[key] = float(value)
+        return values
+
+    def test_request_metrics(self):
+        """
+        Проверить, что запросы к страницам считаются в гистограмме и
+        счётчиках SQL-запросов и кэша по имени URL.
+        """
+        before = self.get_metrics()
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        after = self.get_metrics()
+
+        def delta(key):
+            return after.get(key, 0) - before.get(key, 0)
+
+        view = 'view="posts:index"'
+        self.assertEqual(
+            delta(f'yatube_request_duration_seconds_count{{{view}}}'), 2,
+        )
+        self.assertEqual(
+            delta(
+                f'yatube_request_duration_seconds_bucket{{{view},le="+Inf"}}'
+            ),
+            2,
+        )
+        self.assertGreater(delta(f'yatube_db_queries_total{{{view}}}'), 0)
+        self.assertGreater(
+            delta(f'yatube_cache_lookups_total{{result="hit",{view}}}'), 0,
+        )
+        self.assertEqual(
+            delta(
+                'yatube_feed_cache_lookups_total'
+                '{feed="index",result="miss"}'
+            ),
+            1,
+        )
+
+    def test_metrics_from_other_processes(self):
+        """
+        Проверить, что эндпоинт суммирует метрики, записанные другими
+        процессами в каталог METRICS_DIR.
+        """
+        key = 'yatube_db_queries_total{view="posts:index"}'
+        own = registry.snapshot().get(key, 0)
+        path = os.path.join(self.metrics_dir, f'{os.getppid()}.json')
+        with open(path, 'w') as file:
+            json.dump({key: 5}, file)
+        with open(os.path.join(self.metrics_dir, 'broken.json'), 'w') as file:
+            file.write('{')
+        self.assertEqual(self.get_metrics()[key], own + 5)
+
+    def test_flush(self):
+        """
+        Проверить, что метрики записываются в файл процесса, только если
+        реестр включён.
+        """
+        metrics = MetricsRegistry()
+        metrics.inc('yatube_db_queries_total', 3, view='posts:index')
+        metrics.flush(force=True)
+        self.assertFalse(os.path.exists(metrics.get_path()))
+        metrics.enabled = True
+        metrics.flush(force=True)
+        with open(metrics.get_path()) as file:
+            self.assertEqual(
+                json.load(file),
+                {'yatube_db_queries_total{view="posts:index"}': 3},
+            )
+
+    def test_prune(self):
+        """
+        Проверить, что значения завершившихся процессов переносятся в
+        общий файл, а их файлы удаляются; файлы работающих процессов
+        остаются, и сумма метрик при переносе не уменьшается.
+        """
+        key = 'yatube_db_queries_total{view="finished"}'
+        paths = {}
+        for value in (2, 3):
+            finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+            finished.wait()
+            paths[finished.pid] = value
+        paths[os.getppid()] = 5
+        for pid, value in paths.items():
+            path = os.path.join(self.metrics_dir, f'{pid}.json')
+            with open(path, 'w') as file:
+                json.dump({key: value}, file)
+        temporary_path = os.path.join(
+            self.metrics_dir, f'{finished.pid}.json.tmp',
+        )
+        open(temporary_path, 'w').close()
+
+        self.assertEqual(registry.collect()[key], 10)
+        self.assertEqual(sorted(os.listdir(self.metrics_dir)), sorted([
+            f'{os.getppid()}.json', AGGREGATE_FILENAME, LOCK_FILENAME,
+        ]))
+        with open(os.path.join(self.metrics_dir, AGGREGATE_FILENAME)) as file:
+            self.assertEqual(json.load(file), {key: 5})
+
+        os.rename(
+            os.path.join(self.metrics_dir, f'{os.getppid()}.json'),
+            os.path.join(self.metrics_dir, f'{finished.pid}.json'),
+        )
+        registry.prune()
+        self.assertEqual(registry.collect()[key], 10)
+        with open(os.path.join(self.metrics_dir, AGGREGATE_FILENAME)) as file:
+            self.assertEqual(json.load(file), {key: 10})
+
+    def test_histogram_format(self):
+        """
+        Проверить, что корзины гистограммы накопительные и выводятся по
+        возрастанию границы.
+        """
+        metrics = MetricsRegistry()
+        for value in (0.003, 0.2, 20):
+            metrics.observe(
+                'yatube_thumbnail_generation_seconds', value,
+                geometry='960x339',
+            )
+        lines = [
+            line for line in render_metrics(metrics.snapshot()).splitlines()
+            if line.startswith('yatube_thumbnail_generation_seconds')
+        ]
+        prefix = (
+            'yatube_thumbnail_generation_seconds_bucket{geometry="960x339",'
+        )
+        self.assertEqual(lines[0], prefix + 'le="0.005"} 1')
+        self.assertIn(prefix + 'le="0.25"} 2', lines)
+        self.assertEqual(lines[11], prefix + 'le="+Inf"} 3')
+        self.assertIn(
+            'yatube_thumbnail_generation_seconds_count'
+            '{geometry="960x339"} 3',
+            lines,
+        )
+
+    def test_metrics_allowed_ips(self):
+        """Проверить, что метрики недоступны с посторонних адресов."""
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1',
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,80 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.middleware import slow_requests_logger
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Класс для тестирования middleware профилирования запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создать автора и пост."""
+        cls.user = User.objects.create(username='TestAuthor')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        """Очистить кэш."""
+        cache.clear()
+
+    def get_timing(self, response):
+        """Разобрать заголовок Server-Timing в словарь метрик."""
+        timing = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            timing[name] = dict(param.split('=', 1) for param in params)
+        return timing
+
+    def test_server_timing(self):
+        """
+        Проверить, что ответ содержит имя view-функции, SQL-запросы,
+        время рендеринга шаблонов и обращения к кэшу.
+        """
+        response = self.client.get('/')
+        timing = self.get_timing(response)
+        self.assertEqual(timing['view']['desc'], '"posts:index"')
+        self.assertNotEqual(timing['sql']['desc'], '"0 queries"')
+        self.assertGreater(float(timing['tpl']['dur']), 0)
+        self.assertGreater(float(timing['total']['dur']), 0)
+        self.assertRegex(
+            timing['cache']['desc'], r'"\d+ hits [1-9]\d* misses"',
+        )
+
+        response = self.client.get('/')
+        timing = self.get_timing(response)
+        self.assertEqual(timing['sql']['desc'], '"0 queries"')
+        self.assertEqual(float(timing['tpl']['dur']), 0)
+        self.assertRegex(timing['cache']['desc'], r'"[1-9]\d* hits 0 misses"')
+
+    def test_unresolved_request(self):
+        """Проверить заголовок для адреса, не найденного в URLconf."""
+        response = self.client.get('/unexisting_page/')
+        self.assertNotIn('view', self.get_timing(response))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_request_log(self):
+        """
+        Проверить, что медленный запрос записывается в журнал строкой
+        JSON с самыми медленными SQL-запросами.
+        """
+        with self.assertLogs('yatube.slow_requests') as logs:
+            self.client.get(f'/posts/{self.post.id}/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:post_detail')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertTrue(record['slowest_sql'])
+        self.assertLessEqual(len(record['slowest_sql']), record['sql_count'])
+
+    def test_fast_request_not_logged(self):
+        """Проверить, что быстрые запросы не записываются в журнал."""
+        with patch.object(slow_requests_logger, 'warning') as warning:
+            self.client.get('/')
+        warning.assert_not_called()
@@ -0,0 +1,73 @@
+import os
+import sys
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core.management.commands.benchmark_startup import (
+    group_by_package, measure_startup, parse_importtime,
+)
+
+
+class StartupTests(SimpleTestCase):
+    """Класс для тестирования профилей настроек и замера запуска."""
+
+    def test_parse_importtime(self):
+        """Проверить разбор вывода python -X importtime."""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   debug_toolbar.settings\n'
+            'import time:        30 |        150 | debug_toolbar\n'
+        )
+        self.assertEqual(parse_importtime(output), {
+            'debug_toolbar.settings': 120,
+            'debug_toolbar': 30,
+        })
+
+    def test_prod_profile_skips_debug_toolbar(self):
+        """
+        Проверить, что воркер с профилем prod не импортирует
+        debug_toolbar, а с профилем dev - импортирует.
+        """
+        _, dev_modules = measure_startup('dev')
+        _, prod_modules = measure_startup('prod')
+        self.assertIn('debug_toolbar', group_by_package(dev_modules))
+        self.assertIn('posts.views', prod_modules)
+        self.assertNotIn('debug_toolbar', group_by_package(prod_modules))
+
+    def test_prod_profile_settings(self):
+        """
+        Проверить, что профиль prod требует SECRET_KEY из окружения и не
+        меняет настройки base.py на месте.
+        """
+        base = import_module('yatube.settings.base')
+        environ = {
+            key: value for key, value in os.environ.items()
+            if key != 'SECRET_KEY'
+        }
+        with patch.dict(os.environ, environ, clear=True):
+            sys.modules.pop('yatube.settings.prod', None)
+            with self.assertRaises(ImproperlyConfigured):
+                import_module('yatube.settings.prod')
+        with patch.dict(os.environ, SECRET_KEY='prod-secret'):
+            sys.modules.pop('yatube.settings.prod', None)
+            prod = import_module('yatube.settings.prod')
+        self.assertEqual(prod.SECRET_KEY, 'prod-secret')
+        self.assertEqual(prod.DATABASES['default']['CONN_MAX_AGE'], 600)
+        self.assertNotEqual(base.DATABASES['default'].get('CONN_MAX_AGE'), 600)
+        self.assertIn('loaders', prod.TEMPLATES[0]['OPTIONS'])
+        self.assertNotIn('loaders', base.TEMPLATES[0]['OPTIONS'])
+        self.assertTrue(base.TEMPLATES[0]['APP_DIRS'])
+
+    def test_benchmark_startup_command(self):
+        """Проверить, что команда выводит замеры обоих профилей."""
+        out = StringIO()
+        call_command('benchmark_startup', runs=1, top=3, stdout=out)
+        output = out.getvalue()
+        self.assertIn('dev: запуск', output)
+        self.assertIn('prod: запуск', output)
+        self.assertIn('Разница dev - prod', output)
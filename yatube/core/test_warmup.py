@@ -0,0 +1,78 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.template.loaders.filesystem import Loader as FilesystemLoader
+from django.test import TestCase, override_settings
+
+from core.warmup import warm_templates
+from posts.models import Post
+
+User = get_user_model()
+
+
+class WarmupTests(TestCase):
+    """Класс для тестирования прогрева шаблонов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создать автора и пост."""
+        cls.user = User.objects.create(username='TestAuthor')
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def get_loader(self):
+        return engines.all()[0].engine.template_loaders[0]
+
+    def test_cached_loader_outside_debug(self):
+        """Проверить, что вне DEBUG шаблоны загружаются через кэш."""
+        self.assertIsInstance(self.get_loader(), CachedLoader)
+
+    def test_warm_templates(self):
+        """
+        Проверить, что после прогрева страница рендерится без чтения
+        шаблонов с диска.
+        """
+        self.get_loader().reset()
+        cache.clear()
+        warmed, errors = warm_templates()
+        self.assertEqual(errors, {})
+        self.assertIn('base.html', warmed)
+        self.assertIn('posts/includes/paginator.html', warmed)
+        with patch.object(
+            FilesystemLoader, 'get_contents',
+            side_effect=AssertionError('Шаблон прочитан с диска'),
+        ):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_warm_templates_errors(self):
+        """
+        Проверить, что шаблон с ошибкой не прерывает прогрев, а команда
+        warm_templates завершается с ошибкой.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name, content in (
+            ('ok.html', '{{ value }}'),
+            ('broken.html', '{% if %}'),
+        ):
+            with open(os.path.join(directory.name, name), 'w') as template:
+                template.write(content)
+        templates = [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [directory.name],
+        }]
+        with override_settings(TEMPLATES=templates):
+            with self.assertLogs('core.warmup'):
+                warmed, errors = warm_templates()
+            self.assertEqual(warmed, ['ok.html'])
+            self.assertEqual(list(errors), ['broken.html'])
+            with self.assertLogs('core.warmup'), \
+                    self.assertRaises(CommandError):
+                call_command('warm_templates', stderr=StringIO())
@@ -0,0 +1,47 @@
+"""
+Прогрев шаблонов при запуске воркера.
+
+Вне DEBUG Django оборачивает загрузчики шаблонов в cached.Loader, и
+каждый шаблон разбирается один раз за жизнь процесса - при первом
+рендеринге. warm_templates разбирает все шаблоны из каталогов DIRS
+заранее, чтобы за это не платил первый запрос после деплоя.
+"""
+import logging
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+
+def get_template_names(directory):
+    """Получить имена всех шаблонов в каталоге и его подкаталогах."""
+    for root, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            path = os.path.join(root, filename)
+            yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def warm_templates():
+    """
+    Загрузить в кэш все шаблоны из каталогов DIRS бэкендов Django.
+
+    Ошибки разбора не прерывают прогрев, а записываются в журнал.
+    Возвращает список прогретых шаблонов и словарь ошибок по шаблонам.
+    """
+    warmed = []
+    errors = {}
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for directory in backend.engine.dirs:
+            for name in get_template_names(directory):
+                try:
+                    backend.engine.get_template(name)
+                except TemplateSyntaxError as error:
+                    logger.exception('Не удалось разобрать шаблон %s', name)
+                    errors[name] = error
+                else:
+                    warmed.append(name)
+    return warmed, errors
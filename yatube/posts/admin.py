@@ -1,6 +1,92 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+from users.utils import username_prefix_filter
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, User
+from .search import get_search_sql, search_filter
+
+EXACT_COUNT_LIMIT = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Класс паджинатора списков админки для больших таблиц.
+
+    Для списка без фильтров вместо COUNT(*) по всей таблице берёт оценку
+    числа строк: из статистики планировщика в PostgreSQL и по
+    наибольшему id в остальных СУБД. Небольшие таблицы и
+    отфильтрованные списки считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        estimate = self.estimate(queryset.model)
+        if estimate is None or estimate < EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+    @staticmethod
+    def estimate(model):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            return int(row[0]) if row else None
+        return model._default_manager.aggregate(max_pk=Max('pk'))['max_pk']
+
+
+class UsernamePrefixFilter(admin.SimpleListFilter):
+    """
+    Класс фильтра списка админки по началу имени пользователя.
+
+    Вместо списка всех пользователей выводит поле ввода, а фильтрует
+    диапазоном по имени, который обслуживает индекс. Поле с
+    пользователем задаётся атрибутом field.
+    """
+
+    template = 'admin/username_prefix_filter.html'
+    field = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        hidden_params = [
+            (name, value) for name, value in changelist.params.items()
+            if name not in (self.parameter_name, 'p')
+        ]
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': self.value() or '',
+            'hidden_params': hidden_params,
+        }
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        return queryset.filter(
+            username_prefix_filter(self.value(), f'{self.field}__username')
+        )
+
+
+class FollowerFilter(UsernamePrefixFilter):
+    """Класс фильтра подписок по началу имени подписчика."""
+
+    title = 'подписчику'
+    parameter_name = 'user'
+    field = 'user'
 
 
 @admin.register(Post)
@@ -19,10 +105,23 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    # Навигацию по датам выводит тег date_range_hierarchy, без dates().
+    date_hierarchy = 'pub_date'
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Искать посты через полнотекстовый индекс, а не LIKE."""
+        if not search_term.strip():
+            return queryset, False
+        may_have_duplicates = get_search_sql() is None
+        return queryset.filter(search_filter(search_term)), may_have_duplicates
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -57,8 +156,12 @@ class Comment(admin.ModelAdmin):
         'created',
     )
     list_editable = ('post',)
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
     search_fields = ('text',)
     list_filter = ('created',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     empty_value_display = '-пусто-'
 
 
@@ -75,6 +178,27 @@ class Follow(admin.ModelAdmin):
         'author',
     )
     list_editable = ('author',)
-    search_fields = ('author',)
-    list_filter = ('user',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    list_filter = (FollowerFilter,)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     empty_value_display = '-пусто-'
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Найти подписки, в которых имя подписчика или автора начинается
+        со строки поиска.
+
+        Пользователи выбираются подзапросом по индексу на username, а
+        подписки - по индексам на user и author, без сканирования
+        соединения таблиц.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        users = User.objects.filter(
+            username_prefix_filter(search_term),
+        ).values('pk')
+        return queryset.filter(Q(user__in=users) | Q(author__in=users)), False
@@ -0,0 +1,246 @@
+import hashlib
+import time
+from functools import wraps
+
+from core.metrics import registry
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
+
+from .constants import (
+    FEED_CACHE_LOCK_TIMEOUT, FEED_CACHE_STALE_TIMEOUT, FEED_CACHE_TIMEOUT,
+    PAGE_CACHE_TIMEOUT, POST_CARD_CACHE_TIMEOUT,
+)
+from .thumbnails import resolve_thumbnails
+
+GENERATION_KEY = 'feed_generation:{}'
+LOCK_SUFFIX = ':lock'
+CARD_KEY = 'post_card:{}:{}:{}'
+CARD_TEMPLATE = 'posts/includes/article.html'
+PAGE_KEY = 'anonymous_page:{}:{}'
+PAGES_TAG = 'pages'
+
+
+def get_generation(name):
+    """
+    Получить текущее поколение кэша ленты.
+
+    Начальное значение берётся от текущего времени, чтобы после вытеснения
+    счётчика из кэша поколение не совпало со старыми фрагментами.
+    """
+    key = GENERATION_KEY.format(name)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        generation = cache.get(key)
+
+    return generation
+
+
+def bump_generation(name):
+    """
+    Увеличить поколение кэша ленты.
+
+    Все закэшированные фрагменты ленты становятся устаревшими.
+    """
+    key = GENERATION_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_generation(name)
+
+
+def get_generations(names):
+    """
+    Получить текущие поколения нескольких тегов одним запросом к кэшу.
+
+    Отсутствующие поколения создаются так же, как в get_generation.
+    """
+    keys = [GENERATION_KEY.format(name) for name in names]
+    generations = cache.get_many(keys)
+    return [
+        generations[key] if key in generations else get_generation(name)
+        for key, name in zip(keys, names)
+    ]
+
+
+def get_page_version(tags, kwargs):
+    """
+    Получить версию страницы - поколения всех её тегов.
+
+    Теги - строки формата, в которые подставляются аргументы
+    view-функции; все страницы также помечаются тегом PAGES_TAG.
+    """
+    names = [PAGES_TAG] + [tag.format(**kwargs) for tag in tags]
+    return ':'.join(map(str, get_generations(names))).encode()
+
+
+def get_page_etag(tags):
+    """
+    Получить функцию вычисления ETag страницы для декоратора condition.
+
+    ETag строится по пути с параметрами, версии страницы и пользователю
+    с его CSRF-токеном, так как страница персонализирована. Интервал
+    PAGE_CACHE_TIMEOUT также входит в ETag, чтобы клиент не хранил
+    страницу дольше кэша.
+    """
+    def etag(request, *args, **kwargs):
+        parts = [
+            request.get_full_path().encode(),
+            get_page_version(tags, kwargs),
+            str(int(time.time() // PAGE_CACHE_TIMEOUT)).encode(),
+        ]
+        if request.user.is_authenticated:
+            parts.append(str(request.user.pk).encode())
+            parts.append(request.META.get('CSRF_COOKIE', '').encode())
+        return hashlib.md5(b'\x00'.join(parts)).hexdigest()
+    return etag
+
+
+def cache_anonymous_page(*tags):
+    """
+    Кэшировать страницу целиком для анонимных посетителей.
+
+    Ключ строится по пути с параметрами запроса и версии страницы,
+    поэтому при увеличении поколения любого тега страница
+    перестраивается. Авторизованные пользователи всегда получают свежую
+    страницу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+
+            key = PAGE_KEY.format(
+                hashlib.md5(request.get_full_path().encode()).hexdigest(),
+                hashlib.md5(get_page_version(tags, kwargs)).hexdigest(),
+            )
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, PAGE_CACHE_TIMEOUT)
+
+            return response
+        return wrapper
+    return decorator
+
+
+def feed_page(*tags):
+    """
+    Декоратор страниц лент и постов.
+
+    Отвечает 304 на условный GET-запрос с ETag текущей версии страницы,
+    не выполняя view-функцию, и кэширует страницу для анонимных
+    посетителей.
+    """
+    def decorator(view):
+        return condition(etag_func=get_page_etag(tags))(
+            cache_anonymous_page(*tags)(view)
+        )
+    return decorator
+
+
+def count_feed_cache_lookup(name, result):
+    registry.inc('yatube_feed_cache_lookups_total', feed=name, result=result)
+
+
+def get_or_render(name, vary_on, render):
+    """
+    Получить фрагмент ленты из кэша или отрендерить его заново.
+
+    Фрагмент хранится вместе с поколением, для которого он был построен,
+    и временем, после которого он считается устаревшим. Сам фрагмент
+    хранится дольше, FEED_CACHE_STALE_TIMEOUT секунд. Если поколение или
+    время устарели, перестраивает фрагмент только запрос, захвативший
+    блокировку, а остальные отдают устаревшую копию. Попадания,
+    устаревшие копии и промахи считаются в метриках.
+    """
+    key = make_template_fragment_key(f'feed:{name}', vary_on)
+    generation = get_generation(name)
+    cached = cache.get(key)
+    if cached is not None:
+        cached_generation, fresh_until, html = cached
+        if cached_generation == generation and time.time() < fresh_until:
+            count_feed_cache_lookup(name, 'hit')
+            return html
+        if not cache.add(key + LOCK_SUFFIX, 1, FEED_CACHE_LOCK_TIMEOUT):
+            count_feed_cache_lookup(name, 'stale')
+            return html
+
+    count_feed_cache_lookup(name, 'miss')
+
+    try:
+        html = render()
+        cache.set(
+            key,
+            (generation, time.time() + FEED_CACHE_TIMEOUT, html),
+            FEED_CACHE_STALE_TIMEOUT,
+        )
+    finally:
+        if cached is not None:
+            cache.delete(key + LOCK_SUFFIX)
+
+    return html
+
+
+def get_card_version(post):
+    """
+    Получить версию карточки поста.
+
+    Версия - хэш всех полей, которые выводит карточка: при изменении
+    поста, числа комментариев, имени автора или слага группы меняется и
+    ключ карточки.
+    """
+    group = post.group
+    fields = (
+        post.text,
+        str(post.image),
+        post.pub_date.isoformat(),
+        str(post.comment_count),
+        post.author.username,
+        post.author.get_full_name(),
+        group.slug if group else '',
+    )
+    return hashlib.md5('\x00'.join(fields).encode()).hexdigest()
+
+
+def render_post_cards(posts, context):
+    """
+    Получить отрендеренные карточки постов страницы.
+
+    Все карточки запрашиваются из кэша одним get_many, рендерятся только
+    отсутствующие, и они сохраняются одним set_many. Миниатюры для
+    отсутствующих карточек разрешаются одним пакетом; карточка с
+    временным адресом исходного изображения не кэшируется. Фрагменты и
+    страницы с такой карточкой сбрасываются сигналом
+    thumbnails_generated, когда миниатюра будет создана.
+    """
+    posts = list(posts)
+    variant = 'group' if context.get('group') else 'feed'
+    keys = [
+        CARD_KEY.format(post.pk, variant, get_card_version(post))
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    missing = [
+        (post, key) for post, key in zip(posts, keys) if key not in cards
+    ]
+    thumbnails = resolve_thumbnails(post for post, _ in missing)
+    template = context.template.engine.get_template(CARD_TEMPLATE)
+    rendered = {}
+    for post, key in missing:
+        thumbnail = thumbnails.get(post.pk)
+        with context.push(post=post, thumbnail=thumbnail):
+            cards[key] = template.render(context)
+        if thumbnail is None or thumbnail.ready:
+            rendered[key] = cards[key]
+    if rendered:
+        cache.set_many(rendered, POST_CARD_CACHE_TIMEOUT)
+
+    return [mark_safe(cards[key]) for key in keys]
@@ -3,11 +3,62 @@
 
 POSTS_ON_PAGE - количество постов, выводимых на главной странице и на
 страницах сообществ.
+PAGE_RANGE_ON_EACH_SIDE - количество номеров страниц, выводимых в
+паджинаторе слева и справа от текущей.
+PAGE_RANGE_ON_ENDS - количество номеров страниц, выводимых в паджинаторе
+в начале и в конце списка.
+COMMENTS_ON_PAGE - количество комментариев, выводимых на странице поста и
+подгружаемых за один запрос.
 POST_TEXT_CHARS - количество символов поста, выводимых методом __str__.
 страницы profile.html.
 GROUP_TITLE_INTO_SLUG - количество символов из названия группы, которые
 преобразуются в слаг страницы группы.
+FEED_DEFERRED_FIELDS - поля автора и сообщества, которые не выводятся в
+лентах и на странице поста и поэтому не загружаются.
+FEED_CACHE_TIMEOUT - время, через которое фрагмент ленты перестраивается,
+даже если поколение ленты не изменилось, секунд.
+FEED_CACHE_STALE_TIMEOUT - время хранения фрагмента ленты в кэше, секунд.
+Пока фрагмент хранится, его устаревшая копия отдаётся запросам, не
+захватившим блокировку на перестроение.
+FEED_CACHE_LOCK_TIMEOUT - время блокировки на перестроение фрагмента
+ленты, секунд.
+PAGE_CACHE_TIMEOUT - время хранения страницы для анонимных посетителей в
+кэше, секунд. Страница устаревает при изменении её тегов, таймаут лишь
+ограничивает время показа устаревшего имени автора.
+POST_CARD_CACHE_TIMEOUT - время хранения отрендеренной карточки поста в
+кэше, секунд. Изменённая карточка получает новый ключ, таймаут лишь
+ограничивает память.
+SEARCH_RESULTS_LIMIT - максимальное количество постов в результатах
+поиска.
+THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS - размер и параметры миниатюры
+изображения поста.
+THUMBNAILS - все размеры и параметры миниатюр, которые создаются заранее
+при загрузке изображения.
+THUMBNAIL_WORKERS - количество потоков фонового создания миниатюр.
 """
 POSTS_ON_PAGE = 10
+PAGE_RANGE_ON_EACH_SIDE = 3
+PAGE_RANGE_ON_ENDS = 1
+COMMENTS_ON_PAGE = 20
 POST_TEXT_STR = 15
 GROUP_TITLE_INTO_SLUG = 100
+FEED_DEFERRED_FIELDS = (
+    'author__password',
+    'author__last_login',
+    'author__is_superuser',
+    'author__email',
+    'author__is_staff',
+    'author__is_active',
+    'author__date_joined',
+    'group__description',
+)
+FEED_CACHE_TIMEOUT = 60 * 10
+FEED_CACHE_STALE_TIMEOUT = 60 * 60 * 24
+FEED_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_TIMEOUT = 60 * 10
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+SEARCH_RESULTS_LIMIT = 200
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+THUMBNAILS = ((THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS),)
+THUMBNAIL_WORKERS = 2
@@ -0,0 +1,132 @@
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts.models import Post
+from posts.thumbnails import get_many_raw
+
+BATCH_SIZE = 500
+MIN_AGE = 60 * 60
+
+
+def scan_files(root, path, modified_before):
+    """
+    Обойти файлы каталога рекурсивно через os.scandir.
+
+    Возвращает генератор пар (имя относительно root, размер) для файлов,
+    изменённых раньше отметки времени modified_before, поэтому список
+    файлов не хранится в памяти целиком. Более новые файлы пропускаются:
+    они могут принадлежать посту, который ещё сохраняется.
+    """
+    try:
+        entries = os.scandir(os.path.join(root, path))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            name = f'{path}/{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_files(root, name, modified_before)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime < modified_before:
+                    yield name, stat.st_size
+
+
+def batches(iterable, size=BATCH_SIZE):
+    """Разбить поток на списки не длиннее size."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def thumbnail_key(name):
+    """Получить ключ KV-store sorl-thumbnail для файла миниатюры."""
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+class Command(BaseCommand):
+    """
+    Команда очистки медиафайлов.
+
+    Находит изображения постов, на которые не ссылается ни один пост, и
+    миниатюры, отсутствующие в KV-store sorl-thumbnail, и удаляет их.
+    KV-store читается через default.kvstore, поэтому команда работает
+    с любым THUMBNAIL_KVSTORE.
+    Файлы моложе --min-age секунд не трогаются: изображение нового поста
+    записывается на диск раньше, чем сам пост, а миниатюра - раньше
+    записи о ней в KV-store.
+    """
+
+    help = 'Удалить осиротевшие изображения постов и миниатюры'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести список осиротевших файлов',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=MIN_AGE,
+            help='Минимальный возраст удаляемого файла, секунд',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.removed = self.freed = 0
+        modified_before = time.time() - options['min_age']
+        image_field = Post._meta.get_field('image')
+        self.storage = image_field.storage
+        upload_to = image_field.upload_to.strip('/')
+        files = scan_files(settings.MEDIA_ROOT, upload_to, modified_before)
+        for batch in batches(files):
+            names = [name for name, _ in batch]
+            used = set(Post.objects.filter(image__in=names).values_list(
+                'image', flat=True,
+            ))
+            for name, size in batch:
+                if name not in used:
+                    self.remove(name, size, source=True)
+
+        prefix = thumbnail_settings.THUMBNAIL_PREFIX.strip('/')
+        files = scan_files(settings.MEDIA_ROOT, prefix, modified_before)
+        for batch in batches(files):
+            keys = {name: thumbnail_key(name) for name, _ in batch}
+            used = get_many_raw(list(keys.values()))
+            for name, size in batch:
+                if keys[name] not in used:
+                    self.remove(name, size)
+
+        action = 'Найдено' if self.dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {self.removed}, '
+            f'{self.freed / 1024 / 1024:.1f} МБ'
+        ))
+
+    def remove(self, name, size, source=False):
+        """
+        Удалить осиротевший файл.
+
+        Для исходного изображения удаляются также его миниатюры и записи
+        о нём в KV-store.
+        """
+        self.removed += 1
+        self.freed += size
+        if self.dry_run:
+            self.stdout.write(name)
+            return
+        if source:
+            default.kvstore.delete(ImageFile(name, self.storage))
+        os.remove(os.path.join(settings.MEDIA_ROOT, name))
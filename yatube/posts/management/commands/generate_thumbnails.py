@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from sorl.thumbnail.images import ImageFile
+
+from posts.constants import THUMBNAIL_WORKERS
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    """
+    Команда создания миниатюр.
+
+    Параллельно создаёт все настроенные миниатюры для изображений
+    существующих постов и выводит скорость обработки.
+    """
+
+    help = 'Создать миниатюры для изображений всех постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=THUMBNAIL_WORKERS,
+            help='Количество потоков создания миниатюр, 1 - без пула',
+        )
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True,
+        ).distinct()
+        self.storage = Post._meta.get_field('image').storage
+        started = time.monotonic()
+        processed = failed = 0
+        if options['workers'] > 1:
+            executor = ThreadPoolExecutor(max_workers=options['workers'])
+            results = executor.map(self.generate, images.iterator())
+        else:
+            executor = None
+            results = map(self.generate, images.iterator())
+        for success in results:
+            processed += 1
+            failed += not success
+        if executor is not None:
+            executor.shutdown()
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}, ошибок: {failed}, '
+            f'{elapsed:.1f} с, {rate:.1f} изобр./с'
+        ))
+
+    def generate(self, name):
+        """Создать миниатюры одного изображения."""
+        try:
+            generate_thumbnails(ImageFile(name, self.storage))
+        except Exception as error:
+            self.stderr.write(f'{name}: {error}')
+            return False
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+        return True
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    """
+    Команда пересборки лент подписок.
+
+    Заново заполняет таблицу TimelineEntry по существующим подпискам и
+    постам.
+    """
+
+    help = 'Пересобрать ленты подписок пользователей'
+
+    def handle(self, *args, **options):
+        entries = rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, записей: {entries}'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.stats import recount_comment_counts, recount_stats
+
+
+class Command(BaseCommand):
+    """
+    Команда пересчёта счётчиков пользователей.
+
+    Исправляет расхождения таблицы UserStats с таблицами Post, Follow и
+    Comment, а также счётчиков комментариев постов с таблицей Comment.
+    """
+
+    help = 'Пересчитать счётчики постов, подписок и комментариев'
+
+    def handle(self, *args, **options):
+        repaired = recount_stats()
+        posts = recount_comment_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны, исправлено строк: {repaired}, '
+            f'постов: {posts}'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Команда пересборки поискового индекса.
+
+    Заново заполняет таблицу posts_search по существующим постам и
+    комментариям.
+    """
+
+    help = 'Пересобрать полнотекстовый индекс постов и комментариев'
+
+    def handle(self, *args, **options):
+        posts = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс пересобран, постов: {posts}'
+        ))
@@ -0,0 +1,86 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+CREATE_SQL = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        'text, comments, post_id UNINDEXED, '
+        "tokenize = 'unicode61 remove_diacritics 2')",
+    ],
+    'postgresql': [
+        'CREATE TABLE posts_search (id integer PRIMARY KEY, '
+        'post_id integer NOT NULL, document tsvector NOT NULL)',
+        'CREATE INDEX posts_search_document_idx '
+        'ON posts_search USING GIN (document)',
+    ],
+}
+INSERT_SQL = {
+    'sqlite': {
+        'post': (
+            'INSERT INTO posts_search (rowid, post_id, text) '
+            'VALUES (%s, %s, %s)'
+        ),
+        'comment': (
+            'INSERT INTO posts_search (rowid, post_id, comments) '
+            'VALUES (%s, %s, %s)'
+        ),
+    },
+    'postgresql': {
+        'post': (
+            'INSERT INTO posts_search (id, post_id, document) VALUES '
+            "(%s, %s, setweight(to_tsvector('russian', %s), 'A'))"
+        ),
+        'comment': (
+            'INSERT INTO posts_search (id, post_id, document) VALUES '
+            "(%s, %s, setweight(to_tsvector('russian', %s), 'B'))"
+        ),
+    },
+}
+
+
+def insert_rows(cursor, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            batch = []
+    cursor.executemany(sql, batch)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CREATE_SQL:
+        return
+    for sql in CREATE_SQL[vendor]:
+        schema_editor.execute(sql)
+
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    comments = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'text',
+    )
+    with schema_editor.connection.cursor() as cursor:
+        insert_rows(cursor, INSERT_SQL[vendor]['post'], (
+            (-pk, pk, text) for pk, text in posts.iterator()
+        ))
+        insert_rows(
+            cursor, INSERT_SQL[vendor]['comment'], comments.iterator(),
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
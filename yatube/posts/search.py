@@ -0,0 +1,284 @@
+"""
+Полнотекстовый поиск по постам и комментариям.
+
+Индекс хранится в таблице posts_search, которую создаёт миграция: одна
+строка на пост и одна на комментарий, поэтому новый комментарий
+индексируется одной вставкой, а не пересборкой документа поста. Ключ
+строки поста - id поста со знаком минус, строки комментария - id
+комментария, в колонке post_id хранится id поста. В SQLite это
+виртуальная таблица FTS5, в PostgreSQL - таблица с колонкой tsvector и
+GIN-индексом. Текст поста весит больше текста комментариев к нему, а
+релевантность поста складывается из релевантности его строк. Для
+остальных СУБД поиск выполняется сканированием LIKE.
+"""
+import re
+from contextlib import nullcontext
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .constants import SEARCH_RESULTS_LIMIT
+from .models import Comment, Post
+
+SEARCH_BATCH_SIZE = 500
+CONTROL_CHARACTERS = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+SEARCH_SQL = {
+    'sqlite': {
+        'delete': 'DELETE FROM posts_search WHERE rowid = %s',
+        'delete_comments': (
+            'DELETE FROM posts_search WHERE rowid IN '
+            '(SELECT id FROM posts_comment WHERE post_id = %s)'
+        ),
+        'insert_post': (
+            'INSERT INTO posts_search (rowid, post_id, text) '
+            'VALUES (%s, %s, %s)'
+        ),
+        'insert_comment': (
+            'INSERT INTO posts_search (rowid, post_id, comments) '
+            'VALUES (%s, %s, %s)'
+        ),
+        'search': (
+            'SELECT post_id FROM posts_search WHERE posts_search MATCH %s '
+            "AND rank MATCH 'bm25(2.0, 1.0)' {filter}"
+            'GROUP BY post_id ORDER BY sum(rank) LIMIT %s'
+        ),
+        'match': (
+            'SELECT post_id FROM posts_search WHERE posts_search MATCH %s'
+        ),
+        'clear': 'DELETE FROM posts_search',
+    },
+    'postgresql': {
+        'delete': 'DELETE FROM posts_search WHERE id = %s',
+        'delete_comments': (
+            'DELETE FROM posts_search WHERE id IN '
+            '(SELECT id FROM posts_comment WHERE post_id = %s)'
+        ),
+        'insert_post': (
+            'INSERT INTO posts_search (id, post_id, document) VALUES '
+            "(%s, %s, setweight(to_tsvector('russian', %s), 'A'))"
+        ),
+        'insert_comment': (
+            'INSERT INTO posts_search (id, post_id, document) VALUES '
+            "(%s, %s, setweight(to_tsvector('russian', %s), 'B'))"
+        ),
+        'search': (
+            'SELECT post_id FROM posts_search, '
+            "websearch_to_tsquery('russian', %s) AS query "
+            'WHERE document @@ query {filter}'
+            'GROUP BY post_id ORDER BY sum(ts_rank(document, query)) DESC '
+            'LIMIT %s'
+        ),
+        'match': (
+            'SELECT post_id FROM posts_search '
+            "WHERE document @@ plainto_tsquery('russian', %s)"
+        ),
+        'clear': 'TRUNCATE posts_search',
+    },
+}
+
+
+def get_search_sql():
+    """Получить SQL индекса для текущей СУБД или None без поддержки."""
+    return SEARCH_SQL.get(connection.vendor)
+
+
+def get_words(text):
+    """
+    Получить слова поисковой строки. Управляющие символы заменяются
+    пробелами: их не принимают ни FTS5, ни PostgreSQL.
+    """
+    return CONTROL_CHARACTERS.sub(' ', text).split()
+
+
+def fts5_query(text, operator=' '):
+    """
+    Преобразовать поисковую строку в запрос FTS5.
+
+    Каждое слово берётся в кавычки, чтобы символы синтаксиса FTS5 не
+    ломали запрос, и ищется по префиксу. Слова соединяются оператором
+    operator, по умолчанию - неявным AND.
+    """
+    words = (
+        '"{}"*'.format(word.replace('"', '""')) for word in get_words(text)
+    )
+    return operator.join(words)
+
+
+def get_queries(text):
+    """
+    Получить запросы к индексу для поисковой строки: по одному на каждое
+    слово и один на любое из слов для ранжирования.
+    """
+    words = get_words(text)
+    if connection.vendor == 'sqlite':
+        return [fts5_query(word) for word in words], fts5_query(text, ' OR ')
+    return words, ' or '.join(words)
+
+
+def match_sql(sql, words):
+    """
+    Получить SQL id постов, в строках которых встречаются все слова.
+    Слова могут быть в разных строках, например в посте и комментарии,
+    поэтому строки ищутся по каждому слову отдельно.
+    """
+    return ' INTERSECT '.join([sql['match']] * len(words))
+
+
+def insert_rows(cursor, sql, rows):
+    """Вставить строки индекса пачками по SEARCH_BATCH_SIZE."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == SEARCH_BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            batch = []
+    cursor.executemany(sql, batch)
+
+
+def index_posts(post_ids):
+    """
+    Обновить строки индекса с текстами постов.
+
+    Строки удалённых постов удаляются из индекса. Используется при
+    сохранении и удалении постов.
+    """
+    sql = get_search_sql()
+    if sql is None:
+        return
+    post_ids = list(post_ids)
+    posts = Post.objects.filter(pk__in=post_ids).values_list('pk', 'text')
+    with connection.cursor() as cursor:
+        cursor.executemany(sql['delete'], [(-pk,) for pk in post_ids])
+        cursor.executemany(
+            sql['insert_post'], [(-pk, pk, text) for pk, text in posts],
+        )
+
+
+def index_comments(comment_ids):
+    """
+    Обновить строки индекса с текстами комментариев.
+
+    Строки удалённых комментариев удаляются из индекса. Используется при
+    сохранении и удалении комментариев.
+    """
+    sql = get_search_sql()
+    if sql is None:
+        return
+    comment_ids = list(comment_ids)
+    comments = Comment.objects.filter(pk__in=comment_ids).values_list(
+        'pk', 'post_id', 'text',
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql['delete'], [(pk,) for pk in comment_ids])
+        cursor.executemany(sql['insert_comment'], list(comments))
+
+
+def unindex_post_comments(post_id):
+    """
+    Удалить из индекса строки всех комментариев поста одним запросом.
+
+    Используется перед удалением поста, пока его комментарии ещё есть
+    в таблице posts_comment.
+    """
+    sql = get_search_sql()
+    if sql is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(sql['delete_comments'], [post_id])
+
+
+@transaction.atomic
+def rebuild_search_index():
+    """
+    Пересобрать поисковый индекс по таблицам Post и Comment.
+
+    Возвращает количество проиндексированных постов.
+    """
+    sql = get_search_sql()
+    if sql is None:
+        return 0
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    comments = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'text',
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql['clear'])
+        insert_rows(cursor, sql['insert_post'], (
+            (-pk, pk, text) for pk, text in posts.iterator()
+        ))
+        insert_rows(cursor, sql['insert_comment'], comments.iterator())
+
+    return posts.count()
+
+
+def like_filter(text):
+    """Получить условие поиска сканированием LIKE по всем словам."""
+    query = Q()
+    for word in get_words(text):
+        query &= Q(text__icontains=word) | Q(comments__text__icontains=word)
+    return query
+
+
+def like_search_posts(text, limit=SEARCH_RESULTS_LIMIT):
+    """
+    Найти посты сканированием LIKE по текстам постов и комментариев.
+
+    Используется для СУБД без полнотекстового индекса и для сравнения
+    с ним в тестах производительности.
+    """
+    posts = Post.objects.filter(like_filter(text)).distinct().values_list(
+        'pk', flat=True,
+    )
+    return list(posts[:limit])
+
+
+def search_filter(text):
+    """
+    Получить условие фильтрации постов по поисковой строке через индекс.
+
+    В отличие от search_posts, не ранжирует и не ограничивает результаты,
+    поэтому подходит для queryset админки с её сортировкой и
+    постраничным выводом.
+    """
+    sql = get_search_sql()
+    if sql is None:
+        return like_filter(text)
+    if not get_words(text):
+        return Q()
+    words, _ = get_queries(text)
+    return Q(pk__in=RawSQL(match_sql(sql, words), words))
+
+
+def search_posts(text, limit=SEARCH_RESULTS_LIMIT):
+    """
+    Найти посты, в тексте или комментариях которых встречаются все
+    слова запроса.
+
+    Возвращает список id постов от наиболее к наименее релевантному.
+    Запрос, который индекс не смог разобрать, ничего не находит.
+    """
+    if not get_words(text):
+        return []
+    sql = get_search_sql()
+    if sql is None:
+        return like_search_posts(text, limit)
+    words, any_word = get_queries(text)
+    params = [any_word]
+    words_filter = ''
+    if len(words) > 1:
+        words_filter = f'AND post_id IN ({match_sql(sql, words)}) '
+        params.extend(words)
+    params.append(limit)
+    # В PostgreSQL ошибка запроса прерывает всю транзакцию, поэтому там
+    # запрос выполняется в точке сохранения.
+    savepoint = (
+        transaction.atomic() if connection.vendor == 'postgresql'
+        else nullcontext()
+    )
+    try:
+        with savepoint, connection.cursor() as cursor:
+            cursor.execute(sql['search'].format(filter=words_filter), params)
+            return [pk for pk, in cursor.fetchall()]
+    except DatabaseError:
+        return []
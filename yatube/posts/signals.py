@@ -0,0 +1,247 @@
+import threading
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from .cache import PAGES_TAG, bump_generation
+from .models import Comment, Follow, Group, Post, User
+from .search import index_comments, index_posts, unindex_post_comments
+from .stats import change_stats
+from .thumbnails import thumbnails_generated
+from .timeline import backfill_timeline, fan_out_post, trim_timeline
+
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+_local = threading.local()
+
+
+def get_deleting_posts():
+    """
+    Получить множество id постов, удаляемых в текущем потоке. Комментарии
+    этих постов удаляются каскадно и не обновляют счётчики по одному.
+    """
+    if not hasattr(_local, 'deleting_posts'):
+        _local.deleting_posts = set()
+    return _local.deleting_posts
+
+
+def bump_page_tags(*tags):
+    """Сбросить кэш страниц анонимных посетителей с заданными тегами."""
+    for tag in tags:
+        bump_generation(tag)
+
+
+def post_page_tags(post_id, username, slug):
+    """Получить теги страниц, на которых выводится пост."""
+    tags = [f'post:{post_id}', f'profile:{username}']
+    if slug is not None:
+        tags.append(f'group:{slug}')
+    return tags
+
+
+def bump_post_pages(post_id):
+    """Сбросить кэш всех страниц, на которых выводится пост."""
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug',
+    ).first()
+    if post is not None:
+        bump_page_tags(*post_page_tags(post_id, *post))
+
+
+def bump_profile_pages(*user_ids):
+    """Сбросить кэш профилей пользователей, например после подписки."""
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True,
+    )
+    bump_page_tags(*(f'profile:{username}' for username in usernames))
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    """Запомнить сообщество, из которого пост может быть перенесён."""
+    instance.previous_group_slug = None
+    if instance.pk is not None:
+        instance.previous_group_slug = Post.objects.filter(
+            pk=instance.pk,
+        ).values_list('group__slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """
+    Сбросить кэш главной страницы и страниц поста, обновить поисковый
+    индекс, добавить новый пост в ленты подписчиков и в счётчик автора.
+    """
+    bump_generation('index')
+    index_posts([instance.pk])
+    group = instance.group
+    bump_page_tags(*post_page_tags(
+        instance.pk,
+        instance.author.username,
+        group.slug if group else None,
+    ))
+    previous_group_slug = getattr(instance, 'previous_group_slug', None)
+    if previous_group_slug is not None:
+        bump_page_tags(f'group:{previous_group_slug}')
+    if created:
+        fan_out_post(instance)
+        change_stats(instance.author_id, 'post_count', 1)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """
+    Запомнить удаляемый пост и число комментариев каждого автора под
+    ним, чтобы уменьшить их счётчики одним запросом на автора, и убрать
+    комментарии поста из поискового индекса одним запросом.
+    """
+    instance.comment_authors = dict(
+        instance.comments.order_by().values_list('author').annotate(
+            Count('pk'),
+        )
+    )
+    get_deleting_posts().add(instance.pk)
+    unindex_post_comments(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """
+    Сбросить кэш главной страницы и страниц поста, удалить пост из
+    поискового индекса и уменьшить счётчики постов автора и комментариев
+    авторов удалённых вместе с ним комментариев.
+    """
+    get_deleting_posts().discard(instance.pk)
+    comment_authors = getattr(instance, 'comment_authors', {})
+    for author_id, count in comment_authors.items():
+        change_stats(author_id, 'comment_count', -count)
+    bump_generation('index')
+    index_posts([instance.pk])
+    group = instance.group
+    bump_page_tags(f'post:{instance.pk}')
+    if group is not None:
+        bump_page_tags(f'group:{group.slug}')
+    bump_profile_pages(instance.author_id)
+    change_stats(instance.author_id, 'post_count', -1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """
+    Сбросить кэш главной страницы и всех страниц анонимных посетителей:
+    название и адрес сообщества выводятся рядом с каждым его постом.
+    """
+    bump_generation('index')
+    bump_generation(PAGES_TAG)
+
+
+@receiver(thumbnails_generated)
+def thumbnails_ready(sender, image, **kwargs):
+    """
+    Сбросить кэш главной страницы и страниц постов с изображением: в их
+    карточках исходное изображение заменяется миниатюрой.
+    """
+    posts = list(Post.objects.filter(image=image.name).values_list(
+        'pk', 'author__username', 'group__slug',
+    ))
+    if not posts:
+        return
+    bump_generation('index')
+    for post in posts:
+        bump_page_tags(*post_page_tags(*post))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    """
+    Запомнить имя пользователя до изменения. Сохранения, которые не
+    затрагивают имя, например обновление last_login, пропускаются.
+    """
+    instance.previous_names = None
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & set(USER_NAME_FIELDS)
+    ):
+        return
+    instance.previous_names = User.objects.filter(pk=instance.pk).values_list(
+        *USER_NAME_FIELDS,
+    ).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Сбросить кэш главной страницы и всех страниц анонимных посетителей,
+    если изменилось имя пользователя: оно выводится на странице профиля
+    и в карточках его постов на любых страницах.
+    """
+    previous_names = getattr(instance, 'previous_names', None)
+    names = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if previous_names is not None and previous_names != names:
+        bump_generation('index')
+        bump_generation(PAGES_TAG)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """
+    Обновить строку комментария в поисковом индексе. Для нового
+    комментария увеличить счётчики комментариев поста и автора и
+    сбросить кэш страниц, в карточках которых выводится их число.
+    """
+    index_comments([instance.pk])
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1,
+        )
+        change_stats(instance.author_id, 'comment_count', 1)
+        bump_generation('index')
+        bump_post_pages(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """
+    Уменьшить счётчики комментариев поста и автора, сбросить кэш страниц
+    поста и удалить комментарий из поискового индекса. Для комментариев
+    удаляемого поста ничего не делается: всё обновит удаление поста.
+    """
+    if instance.post_id in get_deleting_posts():
+        return
+    index_comments([instance.pk])
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, 0),
+    )
+    change_stats(instance.author_id, 'comment_count', -1)
+    bump_generation('index')
+    bump_post_pages(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    """
+    Заполнить ленту подписчика постами нового автора и обновить счётчики
+    подписок и подписчиков.
+    """
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+        change_stats(instance.user_id, 'following_count', 1)
+        change_stats(instance.author_id, 'follower_count', 1)
+        bump_profile_pages(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """
+    Убрать из ленты подписчика посты автора, от которого он отписался,
+    и обновить счётчики подписок и подписчиков.
+    """
+    trim_timeline(instance.user_id, instance.author_id)
+    change_stats(instance.user_id, 'following_count', -1)
+    change_stats(instance.author_id, 'follower_count', -1)
+    bump_profile_pages(instance.user_id, instance.author_id)
@@ -0,0 +1,118 @@
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+STATS_FIELDS = (
+    'post_count', 'follower_count', 'following_count', 'comment_count',
+)
+STATS_BATCH_SIZE = 150
+
+
+def count_user_stats(user_id):
+    """Посчитать счётчики пользователя по исходным таблицам."""
+    return {
+        'post_count': Post.objects.filter(author_id=user_id).count(),
+        'follower_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+        'comment_count': Comment.objects.filter(author_id=user_id).count(),
+    }
+
+
+def get_user_stats(user):
+    """
+    Получить счётчики пользователя.
+
+    Если строки счётчиков ещё нет, она создаётся по исходным таблицам.
+    Счётчики считаются только в этом случае, а не при каждом вызове.
+    """
+    try:
+        return UserStats.objects.get(user_id=user.pk)
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(
+            user_id=user.pk,
+            defaults=count_user_stats(user.pk),
+        )
+        return stats
+
+
+def change_stats(user_id, field, delta):
+    """
+    Изменить счётчик пользователя на delta одним UPDATE с F-выражением.
+
+    Уменьшение не опускает счётчик ниже нуля, даже если он разошёлся с
+    исходными таблицами. Если строки счётчиков ещё нет, при увеличении
+    она создаётся по исходным таблицам, а уменьшение пропускается.
+    """
+    value = F(field) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: value}
+    )
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(
+            user_id=user_id,
+            defaults=count_user_stats(user_id),
+        )
+
+
+def _count_by(queryset, field):
+    return dict(
+        queryset.order_by().values_list(field).annotate(Count('pk'))
+    )
+
+
+def recount_stats():
+    """
+    Пересчитать счётчики всех пользователей по исходным таблицам.
+
+    Возвращает количество созданных или исправленных строк.
+    """
+    counts = {
+        'post_count': _count_by(Post.objects, 'author'),
+        'follower_count': _count_by(Follow.objects, 'author'),
+        'following_count': _count_by(Follow.objects, 'user'),
+        'comment_count': _count_by(Comment.objects, 'author'),
+    }
+    existing = UserStats.objects.in_bulk()
+    to_create = []
+    to_update = []
+    user_ids = User.objects.values_list('pk', flat=True)
+    for user_id in user_ids.iterator():
+        values = {
+            field: counts[field].get(user_id, 0) for field in STATS_FIELDS
+        }
+        stats = existing.get(user_id)
+        if stats is None:
+            to_create.append(UserStats(user_id=user_id, **values))
+        elif any(getattr(stats, f) != v for f, v in values.items()):
+            for field, value in values.items():
+                setattr(stats, field, value)
+            to_update.append(stats)
+    UserStats.objects.bulk_create(to_create, batch_size=STATS_BATCH_SIZE)
+    UserStats.objects.bulk_update(
+        to_update, STATS_FIELDS, batch_size=STATS_BATCH_SIZE,
+    )
+
+    return len(to_create) + len(to_update)
+
+
+def recount_comment_counts():
+    """
+    Пересчитать счётчики комментариев постов по таблице Comment.
+
+    Возвращает количество исправленных постов.
+    """
+    posts = Post.objects.only('comment_count').annotate(
+        count=Count('comments'),
+    ).exclude(comment_count=F('count'))
+    to_update = []
+    for post in posts.iterator():
+        post.comment_count = post.count
+        to_update.append(post)
+    Post.objects.bulk_update(
+        to_update, ('comment_count',), batch_size=STATS_BATCH_SIZE,
+    )
+
+    return len(to_update)
@@ -0,0 +1,49 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+FILE_PERMISSIONS = 0o644
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Класс файлового хранилища с адресацией по содержимому.
+
+    Имя сохраняемого файла - SHA-256 его содержимого с исходным
+    расширением, поэтому одинаковые загрузки хранятся в одном файле, а
+    sorl-thumbnail строит для них одну миниатюру.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        """Имя определяется содержимым, поэтому подбирать его не нужно."""
+        return name
+
+    def _save(self, name, content):
+        dirname, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        directory = self.path(dirname)
+        os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            except Exception:
+                os.remove(tmp.name)
+                raise
+
+        name = f'{dirname}/{digest.hexdigest()}{extension}'
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.remove(tmp.name)
+        else:
+            os.chmod(tmp.name, self.file_permissions_mode or FILE_PERMISSIONS)
+            os.replace(tmp.name, full_path)
+
+        return name
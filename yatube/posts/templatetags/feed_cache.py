@@ -0,0 +1,58 @@
+from django import template
+
+from ..cache import get_or_render, render_post_cards
+
+"""Регистрация тега кэширования лент в библиотеке шаблонов."""
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    """Узел шаблона, кэширующий фрагмент ленты по поколению."""
+
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+
+        return get_or_render(
+            name, vary_on, lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag('feed_cache')
+def do_feed_cache(parser, token):
+    """
+    Закэшировать фрагмент ленты.
+
+    Использование: {% feed_cache 'имя_ленты' [переменные ключа...] %}
+    ... {% endfeed_cache %}. Фрагмент сбрасывается при увеличении
+    поколения ленты, а не по таймауту.
+    """
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 1 argument."
+        )
+
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """
+    Получить отрендеренные карточки постов страницы.
+
+    Использование: {% post_cards page_obj as cards %}. Карточки берутся из
+    кэша одним запросом, отсутствующие рендерятся шаблоном article.html.
+    """
+    return render_post_cards(posts, context)
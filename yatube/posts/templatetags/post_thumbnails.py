@@ -0,0 +1,18 @@
+from django import template
+
+from ..thumbnails import resolve_thumbnails
+
+"""Регистрация тегов миниатюр постов в библиотеке шаблонов."""
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post):
+    """
+    Получить миниатюру изображения поста.
+
+    Использование: {% post_thumbnail post as thumbnail %}. Если миниатюра
+    ещё не создана, возвращается адрес исходного изображения, а создание
+    ставится в фоновую очередь.
+    """
+    return resolve_thumbnails([post]).get(post.pk)
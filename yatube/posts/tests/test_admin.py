@@ -0,0 +1,208 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.utils import username_prefix_filter
+
+from ..admin import EstimatedCountPaginator
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AdminTest(TestCase):
+    """Класс для тестирования админки приложения posts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создать администратора, посты, комментарии и подписки."""
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password',
+        )
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Описание тестовой группы',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост номер {i}', author=cls.author, group=cls.group,
+            ) for i in range(5)
+        ]
+        cls.post = Post.objects.create(
+            text='Пост про трамваи', author=cls.author,
+        )
+        for post in cls.posts:
+            Comment.objects.create(
+                text='Комментарий', post=post, author=cls.user,
+            )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        """Авторизовать администратора."""
+        self.client.force_login(self.admin)
+
+    def test_changelists_do_not_list_related_tables(self):
+        """
+        Проверить, что в редактируемых колонках списка комментариев и
+        подписок выводятся только выбранные значения, а не все посты и
+        пользователи.
+        """
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'),
+        )
+        self.assertNotContains(response, self.post.text)
+        response = self.client.get(reverse('admin:posts_follow_changelist'))
+        self.assertNotContains(response, f'>{self.admin.username}</option>')
+
+    def count_queries(self, url):
+        """Получить количество запросов при открытии страницы."""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return len(context)
+
+    def test_changelist_queries(self):
+        """
+        Проверить, что автор, пост и сообщество в колонках списка
+        загружаются вместе со строками. Каждая новая строка может
+        добавить только запрос виджета редактируемой колонки.
+        """
+        urls = [
+            reverse(f'admin:posts_{name}_changelist')
+            for name in ('post', 'comment', 'follow')
+        ]
+        queries = [self.count_queries(url) for url in urls]
+        rows = 3
+        for i in range(rows):
+            user = User.objects.create(username=f'user{i}')
+            post = Post.objects.create(
+                text='Новый пост', author=user, group=self.group,
+            )
+            Comment.objects.create(text='Комментарий', post=post, author=user)
+            Follow.objects.create(user=user, author=self.author)
+        for url, count in zip(urls, queries):
+            with self.subTest(url=url):
+                self.assertLessEqual(self.count_queries(url), count + rows)
+
+    def test_autocomplete(self):
+        """
+        Проверить, что автодополнение находит посты через поисковый
+        индекс, а пользователей - по началу имени с учётом регистра.
+        """
+        response = self.client.get(
+            reverse('admin:posts_post_autocomplete'), {'term': 'трамва'},
+        )
+        self.assertEqual(
+            [result['id'] for result in response.json()['results']],
+            [str(self.post.pk)],
+        )
+        response = self.client.get(
+            reverse('admin:auth_user_autocomplete'), {'term': 'wri'},
+        )
+        self.assertEqual(
+            [result['text'] for result in response.json()['results']],
+            [self.author.username],
+        )
+        for term in ('iter', 'Wri'):
+            with self.subTest(term=term):
+                response = self.client.get(
+                    reverse('admin:auth_user_autocomplete'), {'term': term},
+                )
+                self.assertEqual(response.json()['results'], [])
+
+    def test_username_prefix_filter(self):
+        """
+        Проверить, что вне SQLite поиск по началу имени задаётся через
+        startswith, который обслуживает индекс varchar_pattern_ops.
+        """
+        with patch.object(connection, 'vendor', 'postgresql'):
+            condition = username_prefix_filter('wri', 'user__username')
+        self.assertEqual(condition, Q(user__username__startswith='wri'))
+
+    def test_post_changelist_date_hierarchy(self):
+        """
+        Проверить, что навигация по датам списка постов строится по
+        самой ранней и самой поздней дате, без выборки различных дат
+        публикации по всей таблице.
+        """
+        old_post = Post.objects.create(text='Старый пост', author=self.author)
+        Post.objects.filter(pk=old_post.pk).update(
+            pub_date=self.post.pub_date.replace(year=2020, month=3),
+        )
+        url = reverse('admin:posts_post_changelist')
+        year = self.post.pub_date.year
+        for params, links in (
+            ({}, [f'?pub_date__year={year}', '?pub_date__year=2021']),
+            (
+                {'pub_date__year': 2020},
+                ['?pub_date__month=3&amp;pub_date__year=2020'],
+            ),
+        ):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                for link in links:
+                    self.assertContains(response, link)
+                for query in queries:
+                    self.assertNotIn('DISTINCT', query['sql'])
+
+    def test_follow_user_filter(self):
+        """
+        Проверить, что подписки фильтруются по началу имени подписчика,
+        а в боковой панели нет списка всех пользователей.
+        """
+        Follow.objects.create(user=self.admin, author=self.author)
+        url = reverse('admin:posts_follow_changelist')
+        response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertNotContains(response, f'?user__id__exact={self.user.pk}')
+        response = self.client.get(url, {'user': 'rea', 'o': '1'})
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            list(Follow.objects.filter(user=self.user)),
+        )
+        self.assertContains(
+            response, '<input type="hidden" name="o" value="1">', html=True,
+        )
+
+    def test_estimated_count(self):
+        """
+        Проверить, что паджинатор админки оценивает размер большой
+        таблицы без COUNT(*), а отфильтрованный список считает точно.
+        """
+        posts = Post.objects.all()
+        self.assertEqual(EstimatedCountPaginator(posts, 10).count, 6)
+        with patch.object(
+            EstimatedCountPaginator, 'estimate', return_value=10 ** 6,
+        ):
+            with CaptureQueriesContext(connection) as context:
+                count = EstimatedCountPaginator(posts, 10).count
+            self.assertEqual(count, 10 ** 6)
+            self.assertEqual(len(context), 0)
+            filtered = posts.filter(author=self.author)
+            self.assertEqual(EstimatedCountPaginator(filtered, 10).count, 6)
+
+    def test_follow_search(self):
+        """
+        Проверить, что подписки ищутся по началу имени подписчика или
+        автора, а не по вхождению подстроки.
+        """
+        other = User.objects.create(username='other')
+        Follow.objects.create(user=self.author, author=other)
+        url = reverse('admin:posts_follow_changelist')
+        for term, follows in (
+            ('rea', Follow.objects.filter(user=self.user)),
+            ('wri', Follow.objects.all()),
+            ('oth', Follow.objects.filter(author=other)),
+            ('iter', Follow.objects.none()),
+        ):
+            with self.subTest(term=term):
+                response = self.client.get(url, {'q': term})
+                self.assertEqual(
+                    set(response.context['cl'].result_list), set(follows),
+                )
@@ -1,5 +1,8 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from unittest.mock import patch
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -7,6 +10,7 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from ..models import Comment, Group, Post, User
+from ..thumbnails import enqueue_thumbnail, resolve_thumbnails
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -74,6 +78,11 @@ class FormsTest(TestCase):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
+    @staticmethod
+    def stored_name(content):
+        """Получить имя, под которым хранилище сохранит изображение."""
+        return f'posts/{hashlib.sha256(content).hexdigest()}.gif'
+
     def test_create_new_post(self):
         """
         Проверить создание нового поста при отправке валидной формы на странице
@@ -103,7 +112,7 @@ class FormsTest(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.id, form_data['group'])
         self.assertEqual(post.author, self.user)
-        self.assertEqual(post.image, 'posts/' + self.uploaded.name)
+        self.assertEqual(post.image, self.stored_name(self.small_gif))
 
     def test_edit_post(self):
         """
@@ -130,7 +139,89 @@ class FormsTest(TestCase):
         self.assertEqual(self.post.group.id, form_data['group'])
         self.assertEqual(self.post.author, posts_author_before_change)
         self.assertEqual(
-            self.post.image, 'posts/' + self.another_uploaded.name)
+            self.post.image, self.stored_name(self.another_image))
+
+    def test_upload_enqueues_thumbnails(self):
+        """
+        Проверить, что при создании поста с изображением создание миниатюр
+        ставится в фоновую очередь.
+        """
+        form_data = {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                name='thumbnail.gif',
+                content=self.small_gif,
+                content_type='image/gif',
+            ),
+        }
+        with patch('posts.views.enqueue_thumbnail') as enqueue:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data=form_data,
+            )
+        enqueue.assert_called_once()
+        self.assertEqual(
+            enqueue.call_args[0][0].name, self.stored_name(self.small_gif),
+        )
+
+    def test_thumbnail_generation_modes(self):
+        """
+        Проверить, что миниатюры создаются только после фиксации
+        транзакции способом из настройки THUMBNAIL_GENERATION.
+        """
+        post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='modes.gif',
+                content=self.small_gif,
+                content_type='image/gif',
+            ),
+        )
+        for mode, calls in (('off', 0), ('inline', 1), ('background', 1)):
+            with self.subTest(mode=mode):
+                with override_settings(THUMBNAIL_GENERATION=mode), patch(
+                    'posts.thumbnails.transaction.on_commit',
+                ) as on_commit:
+                    enqueue_thumbnail(post.image)
+                self.assertEqual(on_commit.call_count, calls)
+
+        with override_settings(THUMBNAIL_GENERATION='inline'), patch(
+            'posts.thumbnails.transaction.on_commit',
+        ) as on_commit:
+            enqueue_thumbnail(post.image)
+        self.assertFalse(resolve_thumbnails([post])[post.pk].ready)
+        on_commit.call_args[0][0]()
+        self.assertTrue(resolve_thumbnails([post])[post.pk].ready)
+
+    def test_same_images_stored_once(self):
+        """
+        Проверить, что одинаковые изображения разных постов хранятся в
+        одном файле.
+        """
+        for name in ('first.gif', 'second.gif'):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': f'Пост с картинкой {name}',
+                    'image': SimpleUploadedFile(
+                        name=name,
+                        content=self.small_gif,
+                        content_type='image/gif',
+                    ),
+                },
+            )
+        images = set(Post.objects.filter(
+            text__startswith='Пост с картинкой',
+        ).values_list('image', flat=True))
+        self.assertEqual(images, {self.stored_name(self.small_gif)})
+        files = os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        self.assertIn(
+            os.path.basename(self.stored_name(self.small_gif)), files,
+        )
+        self.assertFalse(
+            any(name.startswith(('first', 'second')) for name in files)
+        )
 
     def test_correct_show_new_comment(self):
         """
@@ -1,7 +1,11 @@
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
 
 from ..constants import POST_TEXT_STR
-from ..models import Group, Post, User
+from ..models import Follow, Group, Post, User
+from ..utils import CursorPaginator, feed_posts, timeline_posts
 
 
 class PostModelTest(TestCase):
@@ -81,3 +85,86 @@ class GroupTest(TestCase):
         group = self.group
         expected_object_str = group.title
         self.assertEqual(expected_object_str, str(group))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса в формате SQLite')
+class QueryPlanTest(TestCase):
+    """
+    Класс для тестирования планов запросов лент.
+
+    Каждая лента должна читаться по индексу, а не полным сканированием
+    таблицы с сортировкой во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Создать объекты пользователя, группы, поста для тестовой БД."""
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Описание тестовой группы',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            group=cls.group,
+            author=cls.user,
+        )
+
+    def get_plan(self, queryset):
+        """Получить строки EXPLAIN QUERY PLAN для queryset."""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_feeds_use_indexes(self):
+        """
+        Проверить, что запросы лент не используют ни полное сканирование
+        таблицы, ни временную сортировку. Querysets строятся теми же
+        функциями, что и во view-функциях.
+        """
+        feeds = {
+            'index': feed_posts(),
+            'group_list': feed_posts(self.group.posts.all()),
+            'profile': feed_posts(self.user.posts.all()),
+        }
+        timeline = timeline_posts(self.user)
+        querysets = {
+            **feeds,
+            'follow_index': timeline,
+            'post_detail': self.post.comments.select_related('author'),
+            'follower': Follow.objects.filter(author=self.user),
+            'following': Follow.objects.filter(
+                user=self.user, author=self.user,
+            ),
+        }
+        after = (self.post.pub_date, self.post.pk)
+        for name, posts in feeds.items():
+            paginator = CursorPaginator(posts, 10)
+            querysets[f'{name}_cursor'] = paginator.get_queryset()
+            querysets[f'{name}_after'] = paginator.get_queryset(after=after)
+            querysets[f'{name}_before'] = paginator.get_queryset(
+                before=after,
+            )
+        follow = CursorPaginator(
+            timeline, 10,
+            date_field='timeline_date', pk_field='timeline_entry',
+        )
+        querysets['follow_index_after'] = follow.get_queryset(after=after)
+        querysets['follow_index_before'] = follow.get_queryset(before=after)
+        comments = CursorPaginator(
+            self.post.comments.select_related('author'), 10,
+            date_field='created',
+        )
+        querysets['comments_cursor'] = comments.get_queryset()
+        querysets['comments_after'] = comments.get_queryset(after=after)
+        for name, queryset in querysets.items():
+            with self.subTest(name=name):
+                for step in self.get_plan(queryset):
+                    self.assertFalse(
+                        step.startswith('SCAN') and 'USING' not in step,
+                        step,
+                    )
+                    self.assertNotIn('TEMP B-TREE', step)
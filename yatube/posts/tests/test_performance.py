@@ -0,0 +1,451 @@
+"""
+Набор тестов производительности страниц приложения posts.
+
+База заполняется пользователями, сообществами, постами, подписками и
+комментариями, после чего каждый маршрут posts.urls запрашивается
+BENCHMARK_SAMPLES раз с пустым кэшем. Для каждого маршрута проверяется
+максимальное количество SQL-запросов и 95-й перцентиль времени ответа.
+Полнотекстовый поиск дополнительно сравнивается со сканированием LIKE,
+а поиск подписок в админке - с поиском Django по умолчанию на отдельной
+таблице подписок из миллионов строк, а рендеринг главной страницы с
+холодным кэшем шаблонов - с рендерингом после прогрева warm_templates.
+
+Переменные окружения:
+BENCHMARK_SCALE - доля реалистичного объёма данных (5000 пользователей,
+100000 постов, 2000000 подписок для поиска в админке). По умолчанию 0.01,
+чтобы тесты проходили быстро;
+для замеров используйте BENCHMARK_SCALE=1. Количество SQL-запросов и
+планы запросов проверяются всегда. Проверки времени - p95 маршрутов и
+поиска и сравнение рендеринга с прогревом шаблонов и без него - зависят
+от скорости машины и на малом объёме нестабильны, поэтому при меньшем
+BENCHMARK_SCALE время только записывается в отчёт, а проверяется лишь
+при BENCHMARK_SCALE=1.
+BENCHMARK_REPORT - путь к JSON-отчёту с результатами замеров, который
+можно сравнивать между коммитами.
+"""
+import json
+import math
+import os
+import random
+import time
+from functools import partial
+from unittest.mock import patch
+
+from django.contrib import admin
+from core.warmup import warm_templates
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.template import engines
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+from ..models import Comment, Follow, Group, Post, User
+from ..search import like_search_posts, rebuild_search_index, search_posts
+from ..stats import recount_comment_counts, recount_stats
+from ..timeline import rebuild_timelines
+from ..urls import urlpatterns
+
+BENCHMARK_SCALE = float(os.environ.get('BENCHMARK_SCALE', 0.01))
+CHECK_TIMINGS = BENCHMARK_SCALE >= 1
+BENCHMARK_REPORT = os.environ.get('BENCHMARK_REPORT')
+BENCHMARK_SEED = 2022
+BENCHMARK_SAMPLES = 20
+BENCHMARK_USERS = 5000
+BENCHMARK_GROUPS = 50
+BENCHMARK_POSTS = 100000
+BENCHMARK_COMMENTS = 100000
+BENCHMARK_FOLLOWS_PER_USER = 20
+BENCHMARK_FOLLOW_SEARCH_USERS = 20000
+BENCHMARK_FOLLOW_SEARCH_ROWS = 2000000
+BENCHMARK_FOLLOW_SEARCH_PAGE = 100
+
+# Маршрут: (максимум SQL-запросов, максимум p95 в секундах).
+ROUTE_BUDGETS = {
+    'index': (4, 0.5),
+    'group_list': (5, 0.5),
+    'profile': (7, 0.5),
+    'post_detail': (5, 0.5),
+    'post_create': (3, 0.5),
+    'post_edit': (5, 0.5),
+    'add_comment': (11, 0.5),
+    'post_comments': (2, 0.5),
+    'follow_index': (4, 0.5),
+    'profile_follow': (10, 0.5),
+    'profile_unfollow': (9, 0.5),
+    'search': (4, 0.5),
+}
+SEARCH_MAX_P95 = 0.1
+FOLLOW_SEARCH_MAX_P95 = 0.1
+REPORT = {}
+
+
+def scaled(volume):
+    """Получить объём данных с учётом BENCHMARK_SCALE."""
+    return max(int(volume * BENCHMARK_SCALE), 2)
+
+
+def percentile(timings, percent):
+    """Получить перцентиль списка замеров методом ближайшего ранга."""
+    timings = sorted(timings)
+    return timings[math.ceil(len(timings) * percent / 100) - 1]
+
+
+def tearDownModule():
+    """Записать отчёт о замерах, если задан BENCHMARK_REPORT."""
+    if BENCHMARK_REPORT:
+        with open(BENCHMARK_REPORT, 'w') as report_file:
+            json.dump(REPORT, report_file, indent=2, ensure_ascii=False)
+
+
+class PerformanceTest(TestCase):
+    """Класс для тестирования производительности страниц приложения posts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Заполнить тестовую БД.
+
+        Пользователи и сообщества создаются через mixer, посты, подписки и
+        комментарии - пакетами с текстами Faker. Ленты подписок и счётчики
+        затем строятся так же, как командами rebuild_timelines и
+        recount_stats.
+        """
+        start = time.time()
+        rnd = random.Random(BENCHMARK_SEED)
+        fake = Faker('ru_RU')
+        fake.seed_instance(BENCHMARK_SEED)
+        users = mixer.cycle(scaled(BENCHMARK_USERS)).blend(
+            User, username=mixer.sequence('user{0}'),
+        )
+        groups = mixer.cycle(scaled(BENCHMARK_GROUPS)).blend(
+            Group, slug=mixer.sequence('group-{0}'),
+        )
+        pub_date = Post._meta.get_field('pub_date')
+        created = Comment._meta.get_field('created')
+        with patch.object(pub_date, 'auto_now_add', False), \
+                patch.object(created, 'auto_now_add', False):
+            Post.objects.bulk_create(
+                (
+                    Post(
+                        text=fake.text(),
+                        author=rnd.choice(users),
+                        group=rnd.choice(groups + [None]),
+                        pub_date=fake.date_time_between(
+                            '-3y', tzinfo=timezone.utc,
+                        ),
+                    ) for _ in range(scaled(BENCHMARK_POSTS))
+                ),
+            )
+            post_ids = list(Post.objects.values_list('pk', flat=True))
+            Comment.objects.bulk_create(
+                (
+                    Comment(
+                        text=fake.sentence(),
+                        author=rnd.choice(users),
+                        post_id=rnd.choice(post_ids),
+                        created=fake.date_time_between(
+                            '-3y', tzinfo=timezone.utc,
+                        ),
+                    ) for _ in range(scaled(BENCHMARK_COMMENTS))
+                ),
+            )
+        follows_per_user = min(BENCHMARK_FOLLOWS_PER_USER, len(users) - 1)
+        Follow.objects.bulk_create(
+            (
+                Follow(user=user, author=author)
+                for user in users
+                for author in rnd.sample(users, follows_per_user)
+                if author != user
+            ),
+            ignore_conflicts=True,
+        )
+        rebuild_timelines()
+        recount_stats()
+        recount_comment_counts()
+        rebuild_search_index()
+        cls.seed_time = time.time() - start
+
+        cls.user = users[0]
+        cls.author = User.objects.exclude(pk=cls.user.pk).annotate(
+            count=Count('posts'),
+        ).order_by('-count').first()
+        cls.group = Group.objects.annotate(
+            count=Count('posts'),
+        ).order_by('-count').first()
+        cls.popular_post = Post.objects.order_by('-comment_count').first()
+        cls.post = Post.objects.filter(author=cls.user).first()
+        if cls.post is None:
+            cls.post = Post.objects.create(text=fake.text(), author=cls.user)
+        cls.search_word = max(
+            cls.popular_post.text.strip('.').split(), key=len,
+        )
+        cls.report = REPORT
+        cls.report.update({
+            'scale': BENCHMARK_SCALE,
+            'samples': BENCHMARK_SAMPLES,
+            'seed_seconds': round(cls.seed_time, 3),
+            'volumes': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+        })
+
+    def setUp(self):
+        """Авторизовать клиент и описать запросы к маршрутам."""
+        self.client.force_login(self.user)
+        self.routes = {
+            'index': {},
+            'group_list': {'kwargs': {'slug': self.group.slug}},
+            'profile': {'kwargs': {'username': self.author.username}},
+            'post_detail': {'kwargs': {'post_id': self.popular_post.id}},
+            'post_create': {},
+            'post_edit': {'kwargs': {'post_id': self.post.id}},
+            'add_comment': {
+                'kwargs': {'post_id': self.popular_post.id},
+                'data': {'text': 'Комментарий'},
+            },
+            'post_comments': {'kwargs': {'post_id': self.popular_post.id}},
+            'search': {'query': {'q': self.search_word}},
+            'follow_index': {},
+            'profile_follow': {
+                'kwargs': {'username': self.author.username},
+                'prepare': self.unfollow_author,
+            },
+            'profile_unfollow': {
+                'kwargs': {'username': self.author.username},
+                'prepare': self.follow_author,
+            },
+        }
+
+    def follow_author(self):
+        Follow.objects.get_or_create(user=self.user, author=self.author)
+
+    def unfollow_author(self):
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+
+    def measure(self, name):
+        """
+        Запросить маршрут BENCHMARK_SAMPLES раз с пустым кэшем.
+
+        Возвращает максимальное количество SQL-запросов и список времён
+        ответа в секундах.
+        """
+        route = self.routes[name]
+        url = reverse(f'posts:{name}', kwargs=route.get('kwargs'))
+        data = route.get('data')
+        send = self.client.post if data else self.client.get
+        data = data or route.get('query')
+        queries = 0
+        timings = []
+        for _ in range(BENCHMARK_SAMPLES):
+            if 'prepare' in route:
+                route['prepare']()
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = send(url, data)
+                timings.append(time.perf_counter() - start)
+            self.assertLess(response.status_code, 400)
+            queries = max(queries, len(context))
+
+        return url, queries, timings
+
+    def test_routes_budgets(self):
+        """
+        Проверить, что каждый маршрут posts.urls укладывается в бюджет
+        SQL-запросов и, при CHECK_TIMINGS, времени ответа, и записать
+        отчёт.
+        """
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names, set(ROUTE_BUDGETS))
+        self.report['routes'] = {}
+        for name in sorted(ROUTE_BUDGETS):
+            max_queries, max_p95 = ROUTE_BUDGETS[name]
+            url, queries, timings = self.measure(name)
+            p95 = percentile(timings, 95)
+            self.report['routes'][name] = {
+                'url': url,
+                'queries': queries,
+                'max_queries': max_queries,
+                'p50': round(percentile(timings, 50), 6),
+                'p95': round(p95, 6),
+                'max_p95': max_p95,
+            }
+            with self.subTest(route=name):
+                self.assertLessEqual(queries, max_queries)
+                if CHECK_TIMINGS:
+                    self.assertLessEqual(p95, max_p95)
+
+    def test_template_warmup(self):
+        """
+        Сравнить первый рендеринг главной страницы после запуска воркера
+        без прогрева шаблонов и после warm_templates.
+        """
+        loader = engines.all()[0].engine.template_loaders[0]
+        url = reverse('posts:index')
+        timings = {'cold': [], 'warm': []}
+        for _ in range(BENCHMARK_SAMPLES):
+            for name in ('cold', 'warm'):
+                loader.reset()
+                cache.clear()
+                if name == 'warm':
+                    warm_templates()
+                start = time.perf_counter()
+                self.client.get(url)
+                timings[name].append(time.perf_counter() - start)
+        self.report['templates'] = {
+            name: {
+                'p50': round(percentile(samples, 50), 6),
+                'p95': round(percentile(samples, 95), 6),
+            } for name, samples in timings.items()
+        }
+        if CHECK_TIMINGS:
+            self.assertLess(
+                percentile(timings['warm'], 50),
+                percentile(timings['cold'], 50),
+            )
+
+    def test_search_index(self):
+        """
+        Сравнить полнотекстовый поиск со сканированием LIKE.
+        Поиск по индексу должен находить пост со словом запроса и, при
+        CHECK_TIMINGS, укладываться в SEARCH_MAX_P95.
+        """
+        timings = {'index': [], 'like': []}
+        for _ in range(BENCHMARK_SAMPLES):
+            for name, search in (
+                ('index', search_posts), ('like', like_search_posts),
+            ):
+                start = time.perf_counter()
+                found = search(self.search_word)
+                timings[name].append(time.perf_counter() - start)
+                self.assertIn(self.popular_post.pk, found)
+        self.report['search'] = {
+            'query': self.search_word,
+            'index_p95': round(percentile(timings['index'], 95), 6),
+            'like_p95': round(percentile(timings['like'], 95), 6),
+            'max_p95': SEARCH_MAX_P95,
+        }
+        if CHECK_TIMINGS:
+            self.assertLessEqual(
+                percentile(timings['index'], 95), SEARCH_MAX_P95,
+            )
+
+
+class FollowSearchPerformanceTest(TestCase):
+    """
+    Класс для тестирования поиска подписок в админке на большой таблице.
+
+    Поиск по началу имени через индексы сравнивается с поиском Django по
+    умолчанию - LIKE по соединению с таблицей пользователей.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Заполнить таблицу подписок.
+
+        Пользователи создаются пакетами, а не через mixer, чтобы
+        заполнение в полном объёме занимало минуты. Каждый пользователь
+        подписан на одинаковое количество следующих за ним.
+        """
+        start = time.time()
+        fake = Faker()
+        fake.seed_instance(BENCHMARK_SEED)
+        users_count = scaled(BENCHMARK_FOLLOW_SEARCH_USERS)
+        User.objects.bulk_create(
+            User(username=f'{fake.user_name()}{i}')
+            for i in range(users_count)
+        )
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        follows_per_user = min(
+            scaled(BENCHMARK_FOLLOW_SEARCH_ROWS) // users_count,
+            users_count - 1,
+        )
+        Follow.objects.bulk_create(
+            Follow(
+                user_id=user_id,
+                author_id=user_ids[(i + shift) % users_count],
+            )
+            for i, user_id in enumerate(user_ids)
+            for shift in range(1, follows_per_user + 1)
+        )
+        cls.seed_time = time.time() - start
+        cls.search_term = User.objects.get(pk=user_ids[0]).username[:3]
+
+    def setUp(self):
+        """Получить класс админки подписок и запрос к списку подписок."""
+        self.model_admin = admin.site._registry[Follow]
+        self.request = RequestFactory().get('/admin/posts/follow/')
+
+    def search(self, get_search_results):
+        """
+        Выполнить поиск так же, как список админки: посчитать найденные
+        подписки и выбрать первую страницу.
+
+        Возвращает id подписок первой страницы, время поиска в секундах
+        и queryset найденных подписок.
+        """
+        queryset = self.model_admin.get_queryset(self.request)
+        start = time.perf_counter()
+        found, use_distinct = get_search_results(
+            self.request, queryset, self.search_term,
+        )
+        if use_distinct:
+            found = found.distinct()
+        found.count()
+        page = list(found.values_list('pk', flat=True)[
+            :BENCHMARK_FOLLOW_SEARCH_PAGE
+        ])
+        return page, time.perf_counter() - start, found
+
+    def test_follow_search(self):
+        """
+        Проверить, что поиск подписок по началу имени обходится без
+        сканирования таблицы подписок, находит только подходящие подписки
+        и, при CHECK_TIMINGS, укладывается в FOLLOW_SEARCH_MAX_P95.
+        """
+        timings = {'index': [], 'default': []}
+        searches = (
+            ('index', self.model_admin.get_search_results),
+            ('default', partial(
+                admin.ModelAdmin.get_search_results, self.model_admin,
+            )),
+        )
+        for _ in range(BENCHMARK_SAMPLES):
+            for name, get_search_results in searches:
+                page, timing, found = self.search(get_search_results)
+                timings[name].append(timing)
+        page, _, found = self.search(self.model_admin.get_search_results)
+        self.assertTrue(page)
+        for follow in Follow.objects.filter(pk__in=page).select_related(
+            'user', 'author',
+        ):
+            self.assertTrue(
+                follow.user.username.startswith(self.search_term)
+                or follow.author.username.startswith(self.search_term)
+            )
+        plan = found.explain()
+        REPORT['follow_search'] = {
+            'query': self.search_term,
+            'seed_seconds': round(self.seed_time, 3),
+            'follows': Follow.objects.count(),
+            'index_p95': round(percentile(timings['index'], 95), 6),
+            'default_p95': round(percentile(timings['default'], 95), 6),
+            'max_p95': FOLLOW_SEARCH_MAX_P95,
+            'plan': plan,
+        }
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('SCAN posts_follow', plan)
+        if CHECK_TIMINGS:
+            self.assertLessEqual(
+                percentile(timings['index'], 95), FOLLOW_SEARCH_MAX_P95,
+            )
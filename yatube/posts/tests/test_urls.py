@@ -50,6 +50,8 @@ class PostsURLTest(TestCase):
             '/create/': HTTPStatus.FOUND,
             f'/posts/{self.post.id}/edit/': HTTPStatus.FOUND,
             f'/posts/{self.post.id}/comment/': HTTPStatus.FOUND,
+            f'/posts/{self.post.id}/comments/': HTTPStatus.OK,
+            '/search/': HTTPStatus.OK,
             f'/profile/{self.user.username}/follow/': HTTPStatus.FOUND,
             f'/profile/{self.user.username}/unfollow/': HTTPStatus.FOUND,
             '/follow/': HTTPStatus.FOUND,
@@ -1,15 +1,39 @@
+import base64
+import os
+from http import HTTPStatus
 import shutil
 import tempfile
+from io import StringIO
+from unittest.mock import Mock, patch
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.kvstores.base import KVStoreBase
 
-from ..models import Comment, Follow, Group, Post, User
-from ..constants import POSTS_ON_PAGE
+from ..models import (
+    Comment, Follow, Group, Post, TimelineEntry, User, UserStats,
+)
+from ..cache import (
+    LOCK_SUFFIX, bump_generation, get_generation, get_or_render,
+)
+from ..constants import (
+    COMMENTS_ON_PAGE, POSTS_ON_PAGE, THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS,
+)
+from ..search import search_filter, search_posts
+from ..stats import get_user_stats
+from ..thumbnails import generate_thumbnails, resolve_thumbnails
+from ..utils import (
+    CursorPage, encode_cursor, feed_posts, get_elided_page_range,
+)
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -79,6 +103,9 @@ class ViewsTest(TestCase):
         self.authorized_client_2.force_login(self.user_2)
         self.fields = ('id', 'text', 'group', 'author', 'image')
         cache.clear()
+        patcher = patch('posts.thumbnails.enqueue_thumbnail')
+        self.enqueue_thumbnail = patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_views_uses_correct_templates(self):
         """Проверить, что view-функции используют верные шаблоны."""
@@ -202,6 +229,19 @@ class ViewsTest(TestCase):
             form_fields['text'],
         )
 
+    def test_feed_posts_loads_related_rows(self):
+        """
+        Проверить, что посты из feed_posts не догружают автора и сообщество
+        отдельными запросами, а неиспользуемые поля откладывают.
+        """
+        post = feed_posts().get(pk=self.post.pk)
+        with self.assertNumQueries(0):
+            post.author.get_full_name()
+            post.author.username
+            post.group.slug
+        self.assertIn('password', post.author.get_deferred_fields())
+        self.assertIn('description', post.group.get_deferred_fields())
+
     def test_view_post_create(self):
         """
         Проверить view-функцию post_create.
@@ -291,25 +331,329 @@ class ViewsTest(TestCase):
         )
 
     def test_cache_index(self):
-        """Проверить кэширование списка постов на главной странице."""
+        """
+        Проверить кэширование списка постов на главной странице.
+        Изменение поста в обход сигналов не должно попадать на страницу,
+        а создание нового поста должно сбрасывать кэш.
+        """
         response_initial = self.authorized_client.get(reverse(
             'posts:index'))
         posts_initial = response_initial.content
 
-        Post.objects.create(text='Тест кеша.', author=self.user)
+        Post.objects.filter(pk=self.post.pk).update(text='Тест кеша.')
+
+        response_after_update = self.authorized_client.get(reverse(
+            'posts:index'))
+        posts_after_update = response_after_update.content
+
+        self.assertEqual(posts_initial, posts_after_update)
+
+        Post.objects.create(text='Новый пост.', author=self.user)
 
         response_after_create = self.authorized_client.get(reverse(
             'posts:index'))
         posts_after_create = response_after_create.content
+        self.assertNotEqual(posts_after_update, posts_after_create)
+        self.assertContains(response_after_create, 'Новый пост.')
+
+    def test_cache_index_serves_stale_while_rebuilding(self):
+        """
+        Проверить, что пока фрагмент главной страницы перестраивается
+        другим запросом, отдаётся его устаревшая копия.
+        """
+        render = Mock(return_value='свежий')
+        self.assertEqual(get_or_render('test', [], lambda: 'старый'), 'старый')
+        bump_generation('test')
+        key = make_template_fragment_key('feed:test', [])
+        cache.add(key + LOCK_SUFFIX, 1)
+        self.assertEqual(get_or_render('test', [], render), 'старый')
+        render.assert_not_called()
+        cache.delete(key + LOCK_SUFFIX)
+        self.assertEqual(get_or_render('test', [], render), 'свежий')
+
+    def test_cache_index_serves_stale_after_timeout(self):
+        """
+        Проверить, что после FEED_CACHE_TIMEOUT фрагмент остаётся в кэше и
+        его копия отдаётся, пока фрагмент перестраивает другой запрос.
+        """
+        render = Mock(return_value='свежий')
+        key = make_template_fragment_key('feed:test', [])
+        cache.set(key, (get_generation('test'), 0, 'старый'))
+        cache.add(key + LOCK_SUFFIX, 1)
+        self.assertEqual(get_or_render('test', [], render), 'старый')
+        render.assert_not_called()
+        cache.delete(key + LOCK_SUFFIX)
+        self.assertEqual(get_or_render('test', [], render), 'свежий')
+
+    def test_anonymous_page_cache(self):
+        """
+        Проверить, что анонимный посетитель получает закэшированную
+        страницу без запросов к БД, а авторизованный - свежую.
+        """
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тест кеша.')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertNotContains(response, 'Тест кеша.')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Тест кеша.')
+
+    def test_anonymous_page_cache_invalidation(self):
+        """
+        Проверить, что изменение поста, комментария и подписки сбрасывает
+        кэш только тех страниц, на которых они выводятся.
+        """
+        post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id},
+        )
+        group_url = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug},
+        )
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.user_3.username},
+        )
+        for url in (post_url, group_url, profile_url):
+            self.client.get(url)
+
+        Comment.objects.create(
+            text='Новый комментарий', post=self.post, author=self.user_2,
+        )
+        self.assertContains(self.client.get(post_url), 'Новый комментарий')
+        with self.assertNumQueries(0):
+            self.client.get(profile_url)
+
+        Follow.objects.create(user=self.user_2, author=self.user_3)
+        response = self.client.get(profile_url)
+        self.assertEqual(
+            response.context['stats'].follower_count,
+            self.user_3.following.count(),
+        )
 
-        self.assertEqual(posts_initial, posts_after_create)
+        self.post.group = self.group_2
+        self.post.save()
+        response = self.client.get(group_url)
+        self.assertNotIn(self.post, response.context['page_obj'])
 
+    def test_author_rename_invalidates_pages(self):
+        """
+        Проверить, что изменение имени автора сбрасывает кэш главной
+        страницы и страниц анонимных посетителей с его постами, а
+        обновление last_login кэш не сбрасывает.
+        """
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        for url in urls:
+            self.client.get(url)
+        author = User.objects.get(pk=self.user.pk)
+        author.last_login = author.date_joined
+        author.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get(urls[0])
+
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Переименованный')
+
+    def test_conditional_get(self):
+        """
+        Проверить, что на условный запрос с актуальным ETag страница
+        отвечает 304 без выполнения view-функции, а после изменения
+        поста отдаёт страницу заново.
+        """
+        url = reverse('posts:profile', kwargs={'username': self.user.username})
+        anonymous_etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=anonymous_etag,
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        etag = self.authorized_client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertIsNone(response.context)
+        self.assertNotEqual(anonymous_etag, etag)
+        self.assertNotEqual(
+            self.authorized_client_2.get(url)['ETag'], etag,
+        )
+
+        self.post.text = 'Изменённый пост'
+        self.post.save()
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Изменённый пост')
+
+    def test_post_cards_cache(self):
+        """
+        Проверить кэширование карточек постов.
+        Повторный рендер профиля не должен использовать шаблон карточки,
+        а изменение имени автора должно обновлять карточку.
+        """
+        address = reverse(
+            'posts:profile', kwargs={'username': self.user.username},
+        )
+        get_thumbnail(self.post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+        self.authorized_client.get(address)
+        response = self.authorized_client.get(address)
+        self.assertTemplateNotUsed(response, 'posts/includes/article.html')
+
+        self.user.first_name = 'Лев'
+        self.user.last_name = 'Толстой'
+        self.user.save()
+        response = self.authorized_client.get(address)
+        self.assertTemplateUsed(response, 'posts/includes/article.html')
+        self.assertContains(response, '<article>')
+        self.assertContains(response, 'Автор: Лев Толстой')
+
+    def test_resolve_thumbnails(self):
+        """
+        Проверить пакетное получение миниатюр.
+        Пока миниатюра не создана, возвращается исходное изображение и
+        создание ставится в очередь; созданные миниатюры всей страницы
+        читаются из KV-store одним запросом.
+        """
+        posts = [self.post, Post.objects.create(
+            text='Пост без картинки', author=self.user,
+        )]
+        thumbnails = resolve_thumbnails(posts)
+        self.assertEqual(
+            thumbnails, {self.post.pk: (self.post.image.url, False)},
+        )
+        self.enqueue_thumbnail.assert_called_once_with(self.post.image)
+
+        thumbnail = get_thumbnail(
+            self.post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS,
+        )
         cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails = resolve_thumbnails(posts)
+        self.assertEqual(
+            thumbnails, {self.post.pk: (thumbnail.url, True)},
+        )
 
-        response_after_clear_cache = self.authorized_client.get(reverse(
-            'posts:index'))
-        posts_after_clear_cache = response_after_clear_cache.content
-        self.assertNotEqual(posts_after_create, posts_after_clear_cache)
+    def test_generated_thumbnail_refreshes_pages(self):
+        """
+        Проверить, что после создания миниатюры закэшированные фрагменты
+        и страницы ленты перестраиваются с миниатюрой вместо исходного
+        изображения, а ETag страниц меняется.
+        """
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+        etags = {}
+        for url in urls:
+            for client in (self.client, self.authorized_client_2):
+                response = client.get(url)
+                self.assertContains(response, self.post.image.url)
+            etags[url] = response['ETag']
+
+        generate_thumbnails(self.post.image)
+        thumbnail = get_thumbnail(
+            self.post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS,
+        )
+        for url in urls:
+            for client in (self.client, self.authorized_client_2):
+                with self.subTest(url=url, client=client):
+                    response = client.get(url)
+                    self.assertContains(response, thumbnail.url)
+                    self.assertNotContains(response, self.post.image.url)
+            self.assertNotEqual(response['ETag'], etags[url])
+
+    def test_generate_thumbnails_command(self):
+        """
+        Проверить, что команда generate_thumbnails создаёт миниатюры для
+        изображений существующих постов.
+        """
+        stdout = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=stdout)
+        self.assertIn('Обработано изображений: 1', stdout.getvalue())
+        thumbnails = resolve_thumbnails([self.post])
+        self.assertTrue(thumbnails[self.post.pk].ready)
+        self.enqueue_thumbnail.assert_not_called()
+
+    def test_clean_media_command(self):
+        """
+        Проверить, что команда clean_media удаляет только изображения и
+        миниатюры, на которые ничего не ссылается, старше --min-age, а с
+        --dry-run ничего не удаляет.
+        """
+        thumbnail = get_thumbnail(
+            self.post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS,
+        )
+        orphans = ('posts/orphan.gif', 'cache/00/00/orphan.gif')
+        for name in orphans:
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(self.small_gif)
+
+        call_command('clean_media', stdout=StringIO())
+        for name in orphans:
+            with self.subTest(name=name):
+                self.assertTrue(
+                    os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+                )
+
+        stdout = StringIO()
+        call_command('clean_media', dry_run=True, min_age=0, stdout=stdout)
+        for name in orphans:
+            with self.subTest(name=name):
+                self.assertIn(name, stdout.getvalue())
+                self.assertTrue(
+                    os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+                )
+
+        call_command('clean_media', min_age=0, stdout=StringIO())
+        for name in orphans:
+            with self.subTest(name=name):
+                self.assertFalse(
+                    os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name))
+                )
+        self.assertTrue(self.post.image.storage.exists(self.post.image.name))
+        self.assertTrue(thumbnail.exists())
+
+    def test_clean_media_other_kvstore(self):
+        """
+        Проверить, что команда clean_media читает KV-store через
+        default.kvstore и не удаляет миниатюры, записанные в хранилище
+        другого типа.
+        """
+        class DictKVStore(KVStoreBase):
+            def __init__(self):
+                self.data = {}
+
+            def _get_raw(self, key):
+                return self.data.get(key)
+
+            def _set_raw(self, key, value):
+                self.data[key] = value
+
+            def _delete_raw(self, *keys):
+                for key in keys:
+                    self.data.pop(key, None)
+
+            def _find_keys_raw(self, prefix):
+                return [key for key in self.data if key.startswith(prefix)]
+
+        with patch.object(default, 'kvstore', DictKVStore()):
+            thumbnail = get_thumbnail(
+                self.post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS,
+            )
+            orphan = os.path.join(TEMP_MEDIA_ROOT, 'cache/00/00/orphan.gif')
+            os.makedirs(os.path.dirname(orphan), exist_ok=True)
+            with open(orphan, 'wb') as file:
+                file.write(self.small_gif)
+            call_command('clean_media', min_age=0, stdout=StringIO())
+        self.assertTrue(thumbnail.exists())
+        self.assertFalse(os.path.exists(orphan))
 
     def test_follow_possibility(self):
         """Проверить возможность подписаться на автора только 1 раз."""
@@ -393,6 +737,236 @@ class ViewsTest(TestCase):
             response.context.get('page_obj').object_list,
         )
 
+    def test_search(self):
+        """
+        Проверить поиск по постам и комментариям.
+        Пост со словом в тексте должен быть выше поста, в комментарии к
+        которому встречается это слово, а удалённый пост не должен
+        находиться.
+        """
+        post = Post.objects.create(
+            text='Пост про трамваи', author=self.user_2,
+        )
+        Comment.objects.create(
+            text='А я люблю трамваи', post=self.post, author=self.user_2,
+        )
+        response = self.client.get(reverse('posts:search'), {'q': 'трамва'})
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post],
+        )
+        post.delete()
+        response = self.client.get(reverse('posts:search'), {'q': 'трамва'})
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        for query, posts in (
+            ('"*', []), ('\x00', []), ('трамва\x00', [self.post]),
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query},
+                )
+                self.assertEqual(list(response.context['page_obj']), posts)
+        with patch(
+            'posts.search.get_queries', return_value=(['"'], '"'),
+        ):
+            self.assertEqual(search_posts('трамва'), [])
+
+    def test_search_comment_rows(self):
+        """
+        Проверить поиск по строкам комментариев.
+        Слова запроса могут встречаться в разных строках поста, а
+        удалённые комментарии и комментарии удалённого поста не должны
+        находиться.
+        """
+        post = Post.objects.create(text='Пост про трамваи', author=self.user)
+        comment = Comment.objects.create(
+            text='Лучше автобусы', post=post, author=self.user_2,
+        )
+        Comment.objects.create(
+            text='Метро', post=post, author=self.user_2,
+        )
+        self.assertEqual(search_posts('трамва автобус'), [post.pk])
+        self.assertEqual(search_posts('трамва самолёт'), [])
+        comment.delete()
+        self.assertEqual(search_posts('автобус'), [])
+        self.assertEqual(search_posts('метро'), [post.pk])
+        post.delete()
+        self.assertEqual(search_posts('метро'), [])
+        self.assertEqual(
+            Post.objects.filter(search_filter('трамва')).count(), 0,
+        )
+
+    def test_reindex_search_command(self):
+        """
+        Проверить, что команда reindex_search добавляет в индекс посты,
+        созданные в обход сигналов.
+        """
+        Post.objects.bulk_create([
+            Post(text='Массовый импорт', author=self.user_2),
+        ])
+        self.assertEqual(search_posts('импорт'), [])
+        call_command('reindex_search', stdout=StringIO())
+        self.assertEqual(
+            search_posts('импорт'),
+            list(Post.objects.filter(text='Массовый импорт').values_list(
+                'pk', flat=True,
+            )),
+        )
+
+    def test_unfollow_trims_timeline(self):
+        """
+        Проверить, что после отписки посты автора пропадают из ленты
+        подписок.
+        """
+        author_post = Post.objects.create(
+            text='Пост автора из подписок',
+            author=self.user_3,
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(author_post, response.context.get('page_obj'))
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user_3.username},
+        ))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(author_post, response.context.get('page_obj'))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user).exists()
+        )
+
+    def test_rebuild_timelines_command(self):
+        """
+        Проверить, что команда rebuild_timelines восстанавливает ленту
+        подписок по таблицам Follow и Post.
+        """
+        author_post = Post.objects.create(
+            text='Пост автора из подписок',
+            author=self.user_3,
+        )
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context.get('page_obj')), [author_post],
+        )
+
+    def test_profile_stats(self):
+        """
+        Проверить, что счётчики на странице profile соответствуют
+        количеству постов, подписок, подписчиков и комментариев автора.
+        """
+        self.authorized_client_2.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user.username},
+        ))
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый комментарий'},
+        )
+        response = self.authorized_client.get(reverse(
+            'posts:profile', kwargs={'username': self.user.username},
+        ))
+        stats = response.context.get('stats')
+        expected = {
+            'post_count': self.user.posts.count(),
+            'follower_count': self.user.following.count(),
+            'following_count': self.user.follower.count(),
+            'comment_count': self.user.comments.count(),
+        }
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_recount_stats_command(self):
+        """
+        Проверить, что команда recount_stats исправляет расхождения
+        счётчиков с исходными таблицами.
+        """
+        UserStats.objects.filter(user=self.user).update(
+            post_count=100, follower_count=100,
+        )
+        UserStats.objects.filter(user=self.user_2).delete()
+        Post.objects.filter(pk=self.post.pk).update(comment_count=100)
+        call_command('recount_stats', stdout=StringIO())
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.post_count, self.user.posts.count())
+        self.assertEqual(stats.follower_count, self.user.following.count())
+        self.assertTrue(UserStats.objects.filter(user=self.user_2).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, self.post.comments.count())
+
+    def test_stats_do_not_drop_below_zero(self):
+        """
+        Проверить, что удаление строк при разошедшихся нулевых счётчиках
+        не нарушает ограничение счётчиков и оставляет их нулевыми.
+        """
+        get_user_stats(self.user)
+        get_user_stats(self.user_3)
+        UserStats.objects.filter(user__in=(self.user, self.user_3)).update(
+            post_count=0, follower_count=0, following_count=0,
+            comment_count=0,
+        )
+        Comment.objects.get(pk=self.comment.pk).delete()
+        Follow.objects.get(pk=self.follow.pk).delete()
+        Post.objects.get(pk=self.post.pk).delete()
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.comment_count, 0)
+        self.assertEqual(stats.following_count, 0)
+        self.assertEqual(stats.post_count, 0)
+        stats = UserStats.objects.get(user=self.user_3)
+        self.assertEqual(stats.follower_count, 0)
+
+    def test_delete_post_with_bulk_created_comments(self):
+        """
+        Проверить, что комментарий и пост удаляются при разошедшемся
+        нулевом счётчике комментариев, а каскадное удаление комментариев
+        уменьшает счётчик их автора на число запросов, не зависящее от
+        количества комментариев.
+        """
+        post = Post.objects.create(text='Пост', author=self.user)
+        Comment.objects.bulk_create(
+            Comment(text='Комментарий', author=self.user_2, post=post)
+            for _ in range(COMMENTS_ON_PAGE)
+        )
+        count = get_user_stats(self.user_2).comment_count
+        post.comments.first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        with CaptureQueriesContext(connection) as few_comments:
+            Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(
+            get_user_stats(self.user_2).comment_count,
+            count - COMMENTS_ON_PAGE,
+        )
+        post = Post.objects.create(text='Пост', author=self.user)
+        Comment.objects.bulk_create(
+            Comment(text='Комментарий', author=self.user_2, post=post)
+            for _ in range(COMMENTS_ON_PAGE * 3)
+        )
+        with CaptureQueriesContext(connection) as many_comments:
+            Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(len(few_comments), len(many_comments))
+        self.assertEqual(get_user_stats(self.user_2).comment_count, 0)
+
+    def test_comment_count(self):
+        """
+        Проверить, что счётчик комментариев поста меняется при добавлении
+        и удалении комментария и выводится в карточке поста.
+        """
+        count = self.post.comments.count()
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Ещё один комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, count + 1)
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username})
+        )
+        self.assertContains(response, f'Комментариев: {count + 1}')
+        self.post.comments.first().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, count)
+
 
 class PaginatorViewsTest(TestCase):
     """Класс для тестирования паджинатора приложения posts."""
@@ -420,6 +994,7 @@ class PaginatorViewsTest(TestCase):
         """Создает авторизованного пользователя."""
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        cache.clear()
         self.urls = (
             reverse('posts:index'),
             reverse(
@@ -459,3 +1034,239 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     Post.objects.count() - POSTS_ON_PAGE,
                 )
+
+    def test_elided_page_range(self):
+        """
+        Проверить, что паджинатор выводит первую и последнюю страницы и по
+        три страницы вокруг текущей, а пропуск одной страницы не
+        заменяет её многоточием.
+        """
+        for number, num_pages, page_range in (
+            (1, 1, [1]),
+            (5, 10, list(range(1, 11))),
+            (1, 10000, [1, 2, 3, 4, None, 10000]),
+            (5000, 10000, [1, None, *range(4997, 5004), None, 10000]),
+            (10000, 10000, [1, None, 9997, 9998, 9999, 10000]),
+        ):
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(
+                    get_elided_page_range(number, num_pages), page_range,
+                )
+
+    @patch('posts.utils.POSTS_ON_PAGE', 1)
+    def test_paginator_does_not_render_every_page(self):
+        """
+        Проверить, что на странице ленты выводятся ссылки только на
+        ближайшие, первую и последнюю страницы.
+        """
+        last_page = Post.objects.count()
+        for address in self.urls:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertEqual(
+                    response.context['page_obj'].elided_page_range,
+                    [1, 2, 3, 4, None, last_page],
+                )
+                self.assertContains(response, f'?page={last_page}"')
+                self.assertContains(response, '&hellip;')
+                self.assertNotContains(response, '?page=5"')
+
+    def test_cursor_paginator_pages(self):
+        """
+        Проверить курсорную паджинацию для страниц index, group_list,
+        profile.
+        Переход по токену after должен выводить оставшиеся посты, а
+        возврат по токену before - исходную первую страницу.
+        """
+        for address in self.urls:
+            with self.subTest(address=address):
+                first_page = self.authorized_client.get(address).context[
+                    'page_obj']
+                response = self.authorized_client.get(
+                    address, {'after': str(first_page.next_cursor)},
+                )
+                second_page = response.context['page_obj']
+                self.assertIsInstance(second_page, CursorPage)
+                self.assertEqual(
+                    len(second_page),
+                    Post.objects.count() - POSTS_ON_PAGE,
+                )
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(second_page.has_previous())
+                response = self.authorized_client.get(
+                    address, {'before': second_page.previous_cursor},
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    list(first_page),
+                )
+
+    def test_cursor_paginator_before_first_post(self):
+        """
+        Проверить, что токен before самого нового поста открывает первую
+        страницу, а ссылки паджинатора не строятся из пустого токена.
+        """
+        newest = Post.objects.first()
+        for address in self.urls:
+            with self.subTest(address=address):
+                first_page = self.authorized_client.get(address).context[
+                    'page_obj']
+                response = self.authorized_client.get(
+                    address, {'before': encode_cursor(newest)},
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']), list(first_page),
+                )
+                self.assertNotContains(response, '=None')
+
+    def test_cursor_paginator_equal_dates(self):
+        """
+        Проверить, что переход с нумерованной страницы на курсорную не
+        пропускает и не повторяет посты с одинаковой датой публикации.
+        """
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        for address in self.urls:
+            with self.subTest(address=address):
+                first_page = self.authorized_client.get(address).context[
+                    'page_obj']
+                response = self.authorized_client.get(
+                    address, {'after': str(first_page.next_cursor)},
+                )
+                pks = [post.pk for post in first_page]
+                pks += [post.pk for post in response.context['page_obj']]
+                self.assertEqual(
+                    sorted(pks),
+                    sorted(Post.objects.values_list('pk', flat=True)),
+                )
+
+    def test_follow_index_cursor_pages(self):
+        """
+        Проверить курсорную паджинацию ленты подписок.
+        Токены строятся по записям ленты, поэтому страницы не должны
+        пропускать и повторять посты, в том числе с одинаковой датой.
+        """
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        follower = User.objects.create(username='TestFollower')
+        Follow.objects.create(user=follower, author=self.user)
+        self.authorized_client.force_login(follower)
+        address = reverse('posts:follow_index')
+        first_page = self.authorized_client.get(address).context['page_obj']
+        response = self.authorized_client.get(
+            address, {'after': str(first_page.next_cursor)},
+        )
+        second_page = response.context['page_obj']
+        self.assertIsInstance(second_page, CursorPage)
+        self.assertFalse(second_page.has_next())
+        pks = [post.pk for post in first_page]
+        pks += [post.pk for post in second_page]
+        self.assertEqual(
+            sorted(pks), sorted(Post.objects.values_list('pk', flat=True)),
+        )
+        response = self.authorized_client.get(
+            address, {'before': second_page.previous_cursor},
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page),
+        )
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """
+        Проверить, что число запросов страниц index, group_list, profile и
+        follow_index не зависит от количества постов на странице и их
+        комментариев.
+        """
+        follower = User.objects.create(username='TestFollower')
+        Follow.objects.create(user=follower, author=self.user)
+        Comment.objects.bulk_create(
+            Comment(text='Комментарий', author=follower, post=post)
+            for post in Post.objects.all()
+        )
+        client = Client()
+        client.force_login(follower)
+        urls = self.urls + (reverse('posts:follow_index'),)
+        for address in urls:
+            with self.subTest(address=address):
+                cache.clear()
+                with CaptureQueriesContext(connection) as full_page:
+                    client.get(address)
+                cache.clear()
+                with CaptureQueriesContext(connection) as last_page:
+                    client.get(address + '?page=2')
+                self.assertEqual(len(full_page), len(last_page))
+
+    def test_cursor_paginator_invalid_token(self):
+        """
+        Проверить, что при повреждённом или поддельном токене выводится
+        первая страница.
+        """
+        tokens = ['broken-token'] + [
+            base64.urlsafe_b64encode(raw.encode()).decode()
+            for raw in (
+                '2020-01-01T00:00:00+00:00|99999999999999999999999',
+                '2020-01-01T00:00:00+00:00|-1',
+                '2020-01-01T00:00:00|1',
+            )
+        ]
+        for parameter in ('after', 'before'):
+            for token in tokens:
+                with self.subTest(parameter=parameter, token=token):
+                    response = self.authorized_client.get(
+                        reverse('posts:index'), {parameter: token},
+                    )
+                    page_obj = response.context['page_obj']
+                    self.assertEqual(len(page_obj), POSTS_ON_PAGE)
+                    self.assertFalse(page_obj.has_previous())
+                    self.assertTrue(page_obj.has_next())
+
+    def test_cache_index_pages(self):
+        """
+        Проверить, что страницы главной страницы кэшируются по отдельности.
+        """
+        response = self.authorized_client.get(reverse('posts:index'))
+        first_page = response.content
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?page=2'
+        )
+        self.assertNotEqual(response.content, first_page)
+        self.assertEqual(
+            len(response.context['page_obj']),
+            Post.objects.count() - POSTS_ON_PAGE,
+        )
+
+    def test_post_detail_comments_pages(self):
+        """
+        Проверить постраничный вывод комментариев на странице поста.
+        На первой странице выводятся новые комментарии, остальные
+        подгружаются по токену after в виде HTML-фрагмента или JSON.
+        """
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {i}', author=self.user, post=post)
+            for i in range(COMMENTS_ON_PAGE + 5)
+        )
+        comments = list(post.comments.order_by('-created', '-pk'))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        first_page = response.context['comments']
+        self.assertEqual(list(first_page), comments[:COMMENTS_ON_PAGE])
+        self.assertTrue(first_page.has_next())
+
+        url = reverse('posts:post_comments', kwargs={'post_id': post.id})
+        response = self.client.get(url, {'after': first_page.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(
+            list(response.context['comments']),
+            comments[COMMENTS_ON_PAGE:],
+        )
+        self.assertNotContains(response, 'js-more-comments')
+
+        response = self.client.get(
+            url,
+            {'after': first_page.next_cursor},
+            HTTP_ACCEPT='application/json',
+        )
+        data = response.json()
+        self.assertIsNone(data['next'])
+        self.assertIn(comments[-1].text, data['html'])
+        self.assertNotIn(comments[0].text, data['html'])
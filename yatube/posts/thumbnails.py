@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from core.metrics import registry
+from django.conf import settings
+from django.db import connections, transaction
+from django.dispatch import Signal
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDbKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .constants import (
+    THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS, THUMBNAIL_WORKERS, THUMBNAILS,
+)
+
+logger = logging.getLogger(__name__)
+
+Thumbnail = namedtuple('Thumbnail', ('url', 'ready'))
+
+# Отправляется после создания всех миниатюр изображения.
+thumbnails_generated = Signal(providing_args=['image'])
+
+executor = ThreadPoolExecutor(
+    max_workers=THUMBNAIL_WORKERS,
+    thread_name_prefix='thumbnails',
+)
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def get_thumbnail_file(image, geometry=THUMBNAIL_GEOMETRY, **options):
+    """
+    Получить ImageFile миниатюры без обращения к хранилищу и KV-store.
+
+    Имя файла вычисляется так же, как в ThumbnailBackend.get_thumbnail.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = {**THUMBNAIL_OPTIONS, **options}
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+
+    return ImageFile(name, default.storage)
+
+
+def get_many_raw(keys):
+    """
+    Получить значения KV-store для списка ключей.
+
+    Для KV-store на кэше и БД выполняет один get_many и один запрос к БД
+    для промахов кэша, для остальных хранилищ - запрос по каждому ключу.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        values = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in values.items() if value}
+
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing,
+        ).values_list('key', 'value'))
+        kvstore.cache.set_many(
+            {key: stored.get(key, EMPTY_VALUE) for key in missing},
+            thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        values.update(stored)
+
+    return {
+        key: value for key, value in values.items() if value != EMPTY_VALUE
+    }
+
+
+def generate_thumbnails(image):
+    """
+    Создать все настроенные миниатюры изображения.
+
+    Уже созданные миниатюры берутся из KV-store и повторно не строятся.
+    Время создания каждой миниатюры записывается в метрики. После
+    создания отправляется сигнал thumbnails_generated.
+    """
+    for geometry, options in THUMBNAILS:
+        start = time.perf_counter()
+        get_thumbnail(image, geometry, **options)
+        registry.observe(
+            'yatube_thumbnail_generation_seconds',
+            time.perf_counter() - start,
+            geometry=geometry,
+        )
+    thumbnails_generated.send(sender=image.__class__, image=image)
+
+
+def _generate(image):
+    try:
+        generate_thumbnails(image)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', image.name)
+
+
+def _generate_in_background(image):
+    try:
+        _generate(image)
+    finally:
+        with _pending_lock:
+            _pending.discard(image.name)
+        connections.close_all()
+
+
+def _submit(image):
+    with _pending_lock:
+        if image.name in _pending:
+            return
+        _pending.add(image.name)
+    executor.submit(_generate_in_background, image)
+
+
+def enqueue_thumbnail(image):
+    """
+    Поставить создание всех миниатюр изображения в очередь.
+
+    Задача отправляется после фиксации текущей транзакции, чтобы
+    миниатюры не создавались для отменённых изменений. Способ создания
+    задаётся настройкой THUMBNAIL_GENERATION: background - в фоновых
+    потоках, inline - в текущем потоке, off - миниатюры не создаются.
+    Повторная постановка изображения, которое уже в очереди, игнорируется.
+    """
+    mode = settings.THUMBNAIL_GENERATION
+    if mode == 'off':
+        return
+    if mode == 'inline':
+        transaction.on_commit(lambda: _generate(image))
+    else:
+        transaction.on_commit(lambda: _submit(image))
+
+
+def resolve_thumbnails(posts):
+    """
+    Получить миниатюры изображений для списка постов.
+
+    Все миниатюры ищутся в KV-store одним пакетным запросом. Для
+    отсутствующих создание ставится в фоновую очередь, а вместо миниатюры
+    возвращается адрес исходного изображения. Возвращает словарь
+    {id поста: Thumbnail}, посты без изображения в него не попадают.
+    """
+    posts = [post for post in posts if post.image]
+    keys = {
+        post.pk: add_prefix(get_thumbnail_file(post.image).key)
+        for post in posts
+    }
+    values = get_many_raw(list(keys.values()))
+    thumbnails = {}
+    for post in posts:
+        value = values.get(keys[post.pk])
+        if value is not None:
+            thumbnail = deserialize_image_file(value)
+            thumbnails[post.pk] = Thumbnail(thumbnail.url, True)
+        else:
+            enqueue_thumbnail(post.image)
+            thumbnails[post.pk] = Thumbnail(post.image.url, False)
+
+    return thumbnails
@@ -0,0 +1,70 @@
+from django.db import transaction
+
+from .models import Follow, Post, TimelineEntry
+
+TIMELINE_BATCH_SIZE = 300
+
+
+def fan_out_post(post):
+    """
+    Разложить новый пост по лентам всех подписчиков его автора.
+
+    Используется при сохранении нового поста.
+    """
+    followers = Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """
+    Добавить в ленту подписчика все посты автора.
+
+    Используется при создании подписки.
+    """
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date',
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        ),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def trim_timeline(user_id, author_id):
+    """
+    Удалить из ленты подписчика все посты автора.
+
+    Используется при удалении подписки.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+@transaction.atomic
+def rebuild_timelines():
+    """
+    Пересобрать ленты всех пользователей по таблицам Follow и Post.
+
+    Возвращает количество созданных записей ленты.
+    """
+    TimelineEntry.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill_timeline(user_id, author_id)
+
+    return TimelineEntry.objects.count()
@@ -13,6 +13,8 @@ app_name = 'posts'
 - create/ - страница создания поста;
 - posts/<int:post_id>/edit/ - страница редактирования поста;
 - posts/<int:post_id>/comment/ - страница создания комментария;
+- posts/<int:post_id>/comments/ - следующая страница комментариев;
+- search/ - страница поиска по постам и комментариям;
 - follow/ - страница с постами избранных авторов;
 - profile/<str:username>/follow/ - страница создания подписки;
 - profile/<str:username>/unfollow/ - страница удаления подписки
@@ -29,6 +31,12 @@ urlpatterns = [
         views.add_comment,
         name='add_comment',
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments',
+    ),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -1,17 +1,282 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
-from .constants import POSTS_ON_PAGE
+from django.core.paginator import Page, Paginator
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import lazy
 
+from .constants import (
+    COMMENTS_ON_PAGE, FEED_DEFERRED_FIELDS, PAGE_RANGE_ON_EACH_SIDE,
+    PAGE_RANGE_ON_ENDS, POSTS_ON_PAGE,
+)
+from .models import Post
 
-def paginator_func(request, posts):
+CURSOR_SEPARATOR = '|'
+# Граница id в токене: больше не помещается в целое число БД.
+CURSOR_MAX_PK = 2 ** 63
+
+
+def encode_cursor(obj, date_field='pub_date', pk_field='pk'):
+    """
+    Закодировать позицию объекта в ленте в непрозрачный токен.
+
+    Позиция определяется парой (дата, id), по которой отсортированы
+    все ленты постов и комментариев.
+    """
+    date = getattr(obj, date_field)
+    pk = getattr(obj, pk_field)
+    raw = f'{date.isoformat()}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Раскодировать токен позиции в пару (дата, id).
+
+    Для повреждённого или чужого токена, токена с датой без часового
+    пояса или с id вне диапазона целых чисел БД возвращает None.
+    """
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        date, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if date is None or not timezone.is_aware(date):
+        return None
+    if not 0 < pk < CURSOR_MAX_PK:
+        return None
+
+    return date, pk
+
+
+class CursorPage(Page):
+    """
+    Класс страницы курсорного паджинатора.
+
+    Поддерживает тот же интерфейс, что и Page, но не знает ни номера
+    страницы, ни общего количества страниц: вместо этого хранит токены
+    соседних страниц.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self.has_next() and self.object_list:
+            return encode_cursor(
+                self.object_list[-1], self.paginator.date_field,
+                self.paginator.pk_field,
+            )
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous() and self.object_list:
+            return encode_cursor(
+                self.object_list[0], self.paginator.date_field,
+                self.paginator.pk_field,
+            )
+        return None
+
+
+class CursorPaginator(Paginator):
+    """
+    Класс курсорного (keyset) паджинатора.
+
+    Выбирает страницу условием по паре (дата, id) вместо OFFSET и не
+    выполняет COUNT(*), поэтому время выборки не зависит от глубины
+    страницы. Объекты выводятся от новых к старым по полю date_field,
+    а при равной дате - по полю pk_field. Оба поля могут быть
+    аннотациями, если лента сортируется по связанной таблице.
+    """
+
+    date_field = 'pub_date'
+    pk_field = 'pk'
+
+    def __init__(
+        self, object_list, per_page, date_field=None, pk_field=None,
+        **kwargs,
+    ):
+        super().__init__(object_list, per_page, **kwargs)
+        if date_field is not None:
+            self.date_field = date_field
+        if pk_field is not None:
+            self.pk_field = pk_field
+
+    def _after(self, date, pk):
+        return (
+            Q(**{f'{self.date_field}__lt': date})
+            | Q(**{self.date_field: date, f'{self.pk_field}__lt': pk})
+        )
+
+    def _before(self, date, pk):
+        return (
+            Q(**{f'{self.date_field}__gt': date})
+            | Q(**{self.date_field: date, f'{self.pk_field}__gt': pk})
+        )
+
+    def get_queryset(self, after=None, before=None):
+        """
+        Получить queryset объектов страницы до среза: после позиции after
+        от новых к старым или до позиции before от старых к новым.
+        """
+        if before is not None:
+            return self.object_list.filter(
+                self._before(*before)
+            ).order_by(self.date_field, self.pk_field)
+        objects = self.object_list.order_by(
+            f'-{self.date_field}', f'-{self.pk_field}',
+        )
+        if after is not None:
+            objects = objects.filter(self._after(*after))
+        return objects
+
+    def get_page(self, after=None, before=None):
+        """
+        Получить страницу, следующую за токеном after или предшествующую
+        токену before. Без валидного токена, а также если до токена
+        before постов нет, возвращается первая страница.
+        """
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        if before is not None:
+            objects = self.get_queryset(before=before)
+            objects = list(objects[:self.per_page + 1])
+            if not objects:
+                return self.get_page()
+            has_previous = len(objects) > self.per_page
+            objects = objects[:self.per_page][::-1]
+            return CursorPage(objects, self, True, has_previous)
+
+        objects = list(self.get_queryset(after)[:self.per_page + 1])
+        has_next = len(objects) > self.per_page
+        return CursorPage(
+            objects[:self.per_page], self, has_next, after is not None,
+        )
+
+
+def feed_posts(posts=None):
+    """
+    Получить queryset постов для вывода в ленте или на странице поста.
+
+    Автор и сообщество загружаются тем же запросом, что и посты, а их
+    поля, которые не выводятся в шаблонах, откладываются. Без аргумента
+    возвращает все посты.
+    """
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.select_related('author', 'group').defer(
+        *FEED_DEFERRED_FIELDS
+    )
+
+
+def timeline_posts(user):
+    """
+    Получить queryset ленты подписок пользователя.
+
+    Посты выбираются через таблицу ленты и сортируются по её дате и id,
+    которые доступны в полях timeline_date и timeline_entry для
+    курсорного паджинатора.
+    """
+    return feed_posts().filter(
+        timeline_entries__user=user,
+    ).annotate(
+        timeline_date=F('timeline_entries__pub_date'),
+        timeline_entry=F('timeline_entries__pk'),
+    ).order_by('-timeline_date', '-timeline_entry')
+
+
+def get_elided_page_range(
+    number, num_pages,
+    on_each_side=PAGE_RANGE_ON_EACH_SIDE, on_ends=PAGE_RANGE_ON_ENDS,
+):
+    """
+    Получить сокращённый список номеров страниц для паджинатора.
+
+    В список входят on_ends первых и последних страниц и по on_each_side
+    страниц вокруг текущей, пропуски обозначаются None. Длина списка не
+    зависит от общего количества страниц.
+    """
+    ranges = (
+        (1, min(on_ends, num_pages)),
+        (max(number - on_each_side, 1), min(number + on_each_side, num_pages)),
+        (max(num_pages - on_ends + 1, 1), num_pages),
+    )
+    page_range = []
+    for start, end in ranges:
+        last = page_range[-1] if page_range else 0
+        start = max(start, last + 1)
+        if start == last + 2:
+            start = last + 1
+        elif start > last + 2:
+            page_range.append(None)
+        page_range.extend(range(start, end + 1))
+
+    return page_range
+
+
+def paginator_func(request, posts, date_field='pub_date', pk_field='pk'):
     """
     Создать паджинатор.
 
     Используется для постраничного вывода постов в шаблонах, где может быть
-    более 10 постов.
+    более 10 постов. Если в запросе передан токен after или before,
+    страница выбирается курсорным паджинатором без COUNT(*) и OFFSET
+    по полям date_field и pk_field, по которым отсортирован posts.
+    Токен следующей страницы вычисляется лениво, чтобы не выполнять
+    запрос постов, если фрагмент ленты взят из кэша. Номера страниц для
+    шаблона сокращаются get_elided_page_range.
     """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        paginator = CursorPaginator(
+            posts, POSTS_ON_PAGE, date_field=date_field, pk_field=pk_field,
+        )
+        return paginator.get_page(after=after, before=before)
+
     paginator = Paginator(posts, POSTS_ON_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.elided_page_range = get_elided_page_range(
+        page_obj.number, paginator.num_pages,
+    )
+    if page_obj.has_next():
+        page_obj.next_cursor = lazy(
+            lambda: encode_cursor(page_obj[-1], date_field, pk_field), str,
+        )()
 
     return page_obj
+
+
+def comments_paginator_func(request, comments):
+    """
+    Создать курсорную страницу комментариев.
+
+    Комментарии выводятся от новых к старым, как задано в Comment.Meta,
+    и выбираются по паре (created, id), поэтому подгрузка следующих
+    страниц не выполняет ни COUNT(*), ни OFFSET.
+    """
+    paginator = CursorPaginator(
+        comments, COMMENTS_ON_PAGE, date_field='created',
+    )
+    return paginator.get_page(after=request.GET.get('after'))
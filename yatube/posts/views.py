@@ -1,32 +1,45 @@
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
+from django.template.loader import render_to_string
 
+from .cache import feed_page
 from .forms import CommentForm, PostForm
+from .constants import POSTS_ON_PAGE
 from .models import Follow, Group, Post, User
-from .utils import paginator_func
+from .search import search_posts
+from .stats import get_user_stats
+from .thumbnails import enqueue_thumbnail
+from .utils import (
+    comments_paginator_func, feed_posts, paginator_func, timeline_posts,
+)
 
 
+@feed_page('index')
 def index(request):
     """Отобразить главную страницу."""
-    post_list = Post.objects.select_related('author', 'group')
+    post_list = feed_posts()
     context = {'page_obj': paginator_func(request, post_list)}
 
     return render(request, 'posts/index.html', context)
 
 
+@feed_page('group:{slug}')
 def group_posts(request, slug):
     """Отобразить страницу с сообщениями сообщества."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author')
+    post_list = feed_posts(group.posts.all())
     context = {'page_obj': paginator_func(request, post_list), 'group': group}
 
     return render(request, 'posts/group_list.html', context)
 
 
+@feed_page('profile:{username}')
 def profile(request, username):
     """Отобразить страницу пользователя."""
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group')
+    post_list = feed_posts(author.posts.all())
     following = True if (
         request.user.is_authenticated and Follow.objects.filter(
             user=request.user,
@@ -36,31 +49,84 @@ def profile(request, username):
     context = {
         'page_obj': paginator_func(request, post_list),
         'author': author,
+        'stats': get_user_stats(author),
         'following': following,
     }
 
     return render(request, 'posts/profile.html', context)
 
 
+@feed_page('post:{post_id}')
 def post_detail(request, post_id):
     """Отобразить страницу просмотра поста."""
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(feed_posts(), id=post_id)
     comments_list = post.comments.select_related('author')
     form = CommentForm(request.POST or None)
-    context = {'post': post, 'comments': comments_list, 'form': form}
+    context = {
+        'post': post,
+        'stats': get_user_stats(post.author),
+        'comments': comments_paginator_func(request, comments_list),
+        'form': form,
+    }
 
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """
+    Отдать следующую страницу комментариев к посту.
+
+    Возвращает JSON с HTML-фрагментом комментариев и токеном следующей
+    страницы, либо только фрагмент, если JSON не запрошен в заголовке
+    Accept.
+    """
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments_list = post.comments.select_related('author')
+    context = {
+        'post': post,
+        'comments': comments_paginator_func(request, comments_list),
+    }
+    if 'application/json' not in request.META.get('HTTP_ACCEPT', ''):
+        return render(request, 'posts/includes/comments.html', context)
+
+    html = render_to_string(
+        'posts/includes/comments.html', context, request=request,
+    )
+    return JsonResponse({
+        'html': html,
+        'next': context['comments'].next_cursor,
+    })
+
+
+def search(request):
+    """
+    Отобразить результаты поиска по постам и комментариям.
+
+    Посты выводятся от наиболее к наименее релевантному.
+    """
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search_posts(query), POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    posts = feed_posts().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    context = {'page_obj': page_obj, 'query': query}
+
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     """Отобразить страницу создания поста."""
     form = PostForm(request.POST or None, files=request.FILES or None)
     context = {'form': form}
     if form.is_valid():
-        form = form.save(commit=False)
-        form.author = request.user
-        form.save()
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+        if post.image:
+            enqueue_thumbnail(post.image)
 
         return redirect('posts:profile', username=request.user.username)
 
@@ -82,9 +148,11 @@ def post_edit(request, post_id):
     )
     context = {'form': form, 'is_edit': is_edit}
     if form.is_valid():
-        form = form.save(commit=False)
-        form.author = request.user
-        form.save()
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+        if 'image' in form.changed_data and post.image:
+            enqueue_thumbnail(post.image)
 
         return redirect('posts:post_detail', post_id=post_id)
 
@@ -111,10 +179,11 @@ def follow_index(request):
     Отобразить страницу с постами авторов, на которых подписан
     пользователь.
     """
-    all_authors_posts = Post.objects.filter(
-        author__following__user=request.user
-    )
-    context = {'page_obj': paginator_func(request, all_authors_posts)}
+    all_authors_posts = timeline_posts(request.user)
+    context = {'page_obj': paginator_func(
+        request, all_authors_posts,
+        date_field='timeline_date', pk_field='timeline_entry',
+    )}
 
     return render(request, 'posts/follow.html', context)
 
@@ -0,0 +1,28 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from .utils import username_prefix_filter
+
+User = get_user_model()
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    """
+    Класс пользователя для админки.
+
+    Ищет пользователей по началу имени через индекс, а не сканированием
+    LIKE по всем полям. Этим же поиском пользуются виджеты автодополнения
+    полей автора и подписчика.
+    """
+
+    search_fields = ('username',)
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(username_prefix_filter(search_term)), False
@@ -0,0 +1,25 @@
+from django.db import connection
+from django.db.models import Q
+
+MAX_CHAR = '\U0010ffff'
+
+
+def username_prefix_filter(prefix, field='username'):
+    """
+    Получить условие поиска пользователей по началу имени.
+
+    В SQLite строки сравниваются побайтно, поэтому условие записано
+    диапазоном field >= prefix AND field < prefix + MAX_CHAR, который
+    обслуживает обычный индекс по полю. В остальных СУБД порядок строк
+    зависит от правил сортировки, и диапазон может терять имена, поэтому
+    используется startswith: в PostgreSQL его обслуживает индекс
+    varchar_pattern_ops, который Django создаёт для уникального поля
+    username. Поиск чувствителен к регистру, как и сами имена
+    пользователей.
+    """
+    if connection.vendor == 'sqlite':
+        return Q(**{
+            f'{field}__gte': prefix,
+            f'{field}__lt': prefix + MAX_CHAR,
+        })
+    return Q(**{f'{field}__startswith': prefix})
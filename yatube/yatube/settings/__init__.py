@@ -0,0 +1,17 @@
+"""
+Настройки проекта.
+
+Профиль выбирается переменной окружения YATUBE_ENV: dev (по умолчанию) -
+для разработки с debug_toolbar, prod - для сервера. Общие настройки
+находятся в base.py.
+"""
+import os
+
+YATUBE_ENV = os.environ.get('YATUBE_ENV', 'dev')
+
+if YATUBE_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif YATUBE_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ValueError(f'Неизвестный профиль настроек YATUBE_ENV={YATUBE_ENV}')
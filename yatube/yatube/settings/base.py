@@ -1,11 +1,14 @@
 import os
+import tempfile
 from typing import Any, List
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
 
 SECRET_KEY = 'qwoz=y39z)-ky()4p#%kh44cpp^44+jl_3viy_jef55&7ed54&'
 
-DEBUG = True
+DEBUG = False
 
 ALLOWED_HOSTS: List[Any] = [
     'localhost',
@@ -27,11 +30,10 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,9 +48,11 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Вне DEBUG Django сам оборачивает загрузчики в cached.Loader, а
+# yatube.wsgi прогревает кэш шаблонов при запуске воркера.
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.ProfilingDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -121,6 +125,44 @@ CACHES = {
     }
 }
 
-INTERNAL_IPS = [
+# Создание миниатюр загруженных изображений: background - в фоновых
+# потоках, inline - в потоке запроса, off - не создавать.
+THUMBNAIL_GENERATION = 'background'
+
+SLOW_REQUEST_THRESHOLD_MS = 500
+SLOW_REQUEST_LOG = os.path.join(BASE_DIR, 'slow_requests.ndjson')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'ndjson': {
+            'format': '%(message)s',
+        },
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_REQUEST_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'ndjson',
+        },
+    },
+    'loggers': {
+        'yatube.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'yatube_metrics'),
+)
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = [
     '127.0.0.1',
 ]
@@ -0,0 +1,15 @@
+"""Настройки для разработки: DEBUG и debug_toolbar."""
+from .base import *  # noqa: F401,F403
+from .base import INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = True
+
+INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+
+MIDDLEWARE = MIDDLEWARE[:1] + [
+    'debug_toolbar.middleware.DebugToolbarMiddleware',
+] + MIDDLEWARE[1:]
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
@@ -0,0 +1,38 @@
+"""
+Настройки для сервера.
+
+Без debug_toolbar, с кэширующим загрузчиком шаблонов и постоянными
+соединениями с БД. Секретный ключ обязательно задаётся переменной
+окружения SECRET_KEY. Изменяемые настройки base.py копируются, а не
+меняются на месте.
+"""
+import os
+from copy import deepcopy
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, TEMPLATES
+
+if not os.environ.get('SECRET_KEY'):
+    raise ImproperlyConfigured(
+        'Для профиля prod задайте переменную окружения SECRET_KEY'
+    )
+SECRET_KEY = os.environ['SECRET_KEY']
+
+DEBUG = False
+
+TEMPLATES = deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    (
+        'django.template.loaders.cached.Loader',
+        [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ],
+    ),
+]
+
+DATABASES = deepcopy(DATABASES)
+DATABASES['default']['CONN_MAX_AGE'] = 600
@@ -3,11 +3,14 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics
+
 """
 Список URL проекта:
 -/ - основные страницы;
 - auth/ - страницы управления пользователями (регистрация, вход/выход и пр.);
-- about/ - страницы с информацией об авторе и используемых технологиях.
+- about/ - страницы с информацией об авторе и используемых технологиях;
+- metrics - метрики приложения в формате Prometheus.
 """
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
@@ -15,7 +18,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
-    path('__debug__/', include('debug_toolbar.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -27,5 +30,5 @@ if settings.DEBUG:
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT,
     )
 
-    # import debug_toolbar
-    # urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    urlpatterns += [path('__debug__/', include('debug_toolbar.urls'))]
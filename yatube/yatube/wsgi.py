@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
-from django.core.wsgi import get_wsgi_application
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
+from django.conf import settings  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
+from core.metrics import registry  # noqa: E402
+from core.warmup import warm_templates  # noqa: E402
+
 application = get_wsgi_application()
+registry.enable()
+
+if not settings.DEBUG:
+    warm_templates()